@@ -1,12 +1,21 @@
+import functools
 import os
 import re
-from typing import List
+from typing import Annotated, List, Tuple
 
+import msgspec
 from fastapi import FastAPI
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Snapshots and alerts are never mutated after validation; freezing them makes that
+# explicit and turns accidental writes into errors.
+_IMMUTABLE_MODEL_CONFIG = ConfigDict(frozen=True)
 
 
 class ProcessMetric(BaseModel):
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     pid: int
     name: str
     cpu_percent: float = Field(ge=0)
@@ -18,6 +27,8 @@ class ProcessMetric(BaseModel):
 
 
 class MetricsPayload(BaseModel):
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     timestamp: int
     total_cpu_percent: float = Field(ge=0, le=100)
     per_core_cpu_percent: List[float] = Field(default_factory=list)
@@ -26,7 +37,39 @@ class MetricsPayload(BaseModel):
     top_processes: List[ProcessMetric] = Field(default_factory=list, max_length=12)
 
 
+class ProcessMetricRecord(msgspec.Struct, gc=False):
+    """msgspec mirror of ProcessMetric used to decode stored snapshots."""
+
+    pid: int
+    name: str
+    cpu_percent: Annotated[float, msgspec.Meta(ge=0)]
+    memory_mb: Annotated[float, msgspec.Meta(ge=0)]
+    thread_count: Annotated[int, msgspec.Meta(ge=0)] = 0
+    io_read_mb: Annotated[float, msgspec.Meta(ge=0)] = 0
+    io_write_mb: Annotated[float, msgspec.Meta(ge=0)] = 0
+    handle_count: Annotated[int, msgspec.Meta(ge=0)] = 0
+
+
+class MetricsPayloadRecord(msgspec.Struct, gc=False):
+    """msgspec mirror of MetricsPayload used on the recent-metrics read path.
+
+    Decoded records never form reference cycles, so GC tracking is disabled, and
+    per-core values decode into a tuple, which is smaller than a list on 100+ core hosts.
+    """
+
+    timestamp: int
+    total_cpu_percent: Annotated[float, msgspec.Meta(ge=0, le=100)]
+    per_core_cpu_percent: Tuple[float, ...] = ()
+    system_memory_total_mb: Annotated[float, msgspec.Meta(ge=0)] = 0
+    system_memory_used_mb: Annotated[float, msgspec.Meta(ge=0)] = 0
+    top_processes: Annotated[List[ProcessMetricRecord], msgspec.Meta(max_length=12)] = msgspec.field(
+        default_factory=list
+    )
+
+
 class AlertEvent(BaseModel):
+    model_config = _IMMUTABLE_MODEL_CONFIG
+
     timestamp: int
     rule: str
     severity: str
@@ -48,18 +91,22 @@ class HealthResponse(BaseModel):
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 
+_TRAILING_INT = re.compile(r"(\d+)$")
+
 
+@functools.lru_cache(maxsize=None)
 def _parse_int_env(name: str, default: str) -> int:
     raw = os.getenv(name, default)
     try:
         return int(raw)
     except (TypeError, ValueError):
-        match = re.search(r"(\d+)$", str(raw))
+        match = _TRAILING_INT.search(str(raw))
         if match:
             return int(match.group(1))
         return int(default)
 
 
+@functools.lru_cache(maxsize=None)
 def _parse_float_env(name: str, default: str) -> float:
     raw = os.getenv(name, default)
     try:
@@ -70,15 +117,27 @@ def _parse_float_env(name: str, default: str) -> float:
 
 REDIS_PORT = _parse_int_env("REDIS_PORT", "6379")
 REDIS_DB = _parse_int_env("REDIS_DB", "0")
+# Per-process pool cap, shared by all requests; size it to expected concurrent Redis calls per worker.
+REDIS_MAX_CONNECTIONS = max(_parse_int_env("REDIS_MAX_CONNECTIONS", "64"), 1)
 METRICS_KEY = os.getenv("REDIS_METRICS_KEY", "metrics:timeline")
 METRICS_CHANNEL = os.getenv("REDIS_METRICS_CHANNEL", "metrics:live")
 RETENTION_SECONDS = _parse_int_env("RETENTION_SECONDS", "300")
 
 POSTGRES_DSN = os.getenv("POSTGRES_DSN", "")
 POSTGRES_TABLE = os.getenv("POSTGRES_TABLE", "metrics_snapshots")
+POSTGRES_POOL_MIN_SIZE = max(_parse_int_env("POSTGRES_POOL_MIN_SIZE", "2"), 0)
+POSTGRES_POOL_MAX_SIZE = max(_parse_int_env("POSTGRES_POOL_MAX_SIZE", "10"), POSTGRES_POOL_MIN_SIZE, 1)
+# Opt-in, one-off conversion of a legacy JSONB per_core_cpu_percent column; it rewrites the table.
+POSTGRES_MIGRATE_PER_CORE_ARRAY = os.getenv("POSTGRES_MIGRATE_PER_CORE_ARRAY", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
 
 AGENT_API_TOKEN = os.getenv("AGENT_API_TOKEN", "")
 AGENT_RATE_LIMIT_PER_MINUTE = _parse_int_env("AGENT_RATE_LIMIT_PER_MINUTE", "120")
+RATE_LIMIT_KEY_PREFIX = os.getenv("REDIS_RATE_LIMIT_KEY_PREFIX", "agents:rate")
 
 ALERT_CPU_THRESHOLD = _parse_float_env("ALERT_CPU_THRESHOLD", "90")
 ALERT_CPU_DURATION_SECONDS = _parse_int_env("ALERT_CPU_DURATION_SECONDS", "10")
@@ -1,18 +1,23 @@
 """Backend API entrypoints for ingesting, querying, alerting, and streaming system metrics."""
 
-import importlib
-import json
+import asyncio
+import functools
+import hashlib
 import logging
 import re
 import threading
-from collections import defaultdict, deque
-from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict, List, Tuple
-
-from fastapi import Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
-from redis import Redis
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Deque, Dict, List, Set, Tuple
+
+import msgspec
+import orjson
+from fastapi import Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from redis.asyncio import ConnectionPool as AsyncConnectionPool
 from redis.asyncio import Redis as AsyncRedis
-from redis.exceptions import RedisError
+from redis.exceptions import NoScriptError, RedisError
 
 from .declarations import (
         AGENT_API_TOKEN,
@@ -27,47 +32,378 @@ from .declarations import (
         METRICS_CHANNEL,
         METRICS_KEY,
         POSTGRES_DSN,
+        POSTGRES_MIGRATE_PER_CORE_ARRAY,
+        POSTGRES_POOL_MAX_SIZE,
+        POSTGRES_POOL_MIN_SIZE,
         POSTGRES_RETENTION_DAYS,
         POSTGRES_TABLE,
+        RATE_LIMIT_KEY_PREFIX,
         REDIS_DB,
         REDIS_HOST,
+        REDIS_MAX_CONNECTIONS,
         REDIS_PORT,
         RETENTION_SECONDS,
         AlertEvent,
         MetricsPayload,
+        MetricsPayloadRecord,
         app,
 )
 
+try:
+        from psycopg.types.json import Jsonb
+
+        # JSONB columns are encoded when the flusher writes them; orjson is much faster than
+        # the stdlib json.dumps psycopg uses by default.
+        _JSONB = functools.partial(Jsonb, dumps=orjson.dumps)
+        _PSYCOPG_OK = True
+except ImportError:
+        _JSONB = None
+        _PSYCOPG_OK = False
+
+try:
+        import psycopg_pool as _PSYCOPG_POOL
+except ImportError:
+        _PSYCOPG_POOL = None
+
 
 logger = logging.getLogger(__name__)
 _postgres_schema_ready = False
-_agent_rate_windows: Dict[str, Deque[int]] = defaultdict(deque)
-_rate_limit_lock = threading.Lock()
+# Set when the table predates the DOUBLE PRECISION[] per-core column and has not been migrated.
+_postgres_per_core_jsonb = False
+_postgres_pool = None
+_postgres_pool_lock = threading.Lock()
+_postgres_flush_task: asyncio.Task | None = None
+_metrics_broadcast_task: asyncio.Task | None = None
+_metrics_subscribers: Set[asyncio.Queue] = set()
 _alert_state_lock = threading.Lock()
 _high_cpu_window_start_ts: int | None = None
 _high_cpu_alert_active = False
-_last_postgres_prune_epoch = 0
+_last_metrics_prune_epoch = 0
+_last_metrics_expire_epoch = 0
+_POSTGRES_POOL_TIMEOUT_SECONDS = 5.0
+# Flush on whichever comes first: a full batch or the interval; COPY throughput plateaus in the
+# low thousands of rows per statement.
+_POSTGRES_FLUSH_INTERVAL_SECONDS = 1.0
+_POSTGRES_FLUSH_BATCH_SIZE = 5000
+_POSTGRES_BUFFER_MAX_ROWS = 50_000
+_postgres_buffer: Deque[tuple] = deque(maxlen=_POSTGRES_BUFFER_MAX_ROWS)
+# Rows the full buffer discarded since the flusher last logged them.
+_postgres_dropped_rows = 0
+_postgres_dropped_rows_lock = threading.Lock()
+_postgres_flush_wakeup: asyncio.Event | None = None
+_POSTGRES_RETENTION_INTERVAL_SECONDS = 60
+_postgres_retention_task: asyncio.Task | None = None
+_METRICS_PRUNE_INTERVAL_SECONDS = 1
+_METRICS_EXPIRE_REFRESH_SECONDS = max(RETENTION_SECONDS // 4, 1)
+_METRICS_DECODER = msgspec.json.Decoder(MetricsPayloadRecord)
+_ALERT_FIELDS = frozenset(AlertEvent.model_fields)
+_RECENT_METRICS_PAGE_SIZE = 500
+_WS_CLIENT_QUEUE_SIZE = 64
+_WS_BATCH_MAX_FRAMES = 50
+_METRICS_BROADCAST_RETRY_SECONDS = 1.0
+_RECENT_METRICS_CACHE_TTL_SECONDS = 0.5
+_RECENT_METRICS_CACHE_MAX_ENTRIES = 4
+_recent_metrics_cache: Dict[int, Tuple[float, bytes]] = {}
+_recent_metrics_cache_lock = threading.Lock()
+_INGEST_BATCH_MAX_SIZE = 100
+_ingest_batch_queue: asyncio.Queue | None = None
+_ingest_batch_task: asyncio.Task | None = None
+
+# Appends members to one or more rolling sorted-set timelines and publishes them in a
+# single atomic call, gated by the agent's per-minute request counter in KEYS[1]: once the
+# counter exceeds ARGV[1] the call returns 0 and writes nothing (an empty ARGV[1] disables
+# the gate). Each following KEYS pair is a timeline and its channel, with four ARGV entries:
+# score, member, the score to prune below, and the key TTL; empty prune/TTL arguments skip
+# that step.
+_TIMELINE_APPEND_LUA = """
+if ARGV[1] ~= '' then
+        local count = redis.call('INCR', KEYS[1])
+        if count == 1 then
+                redis.call('EXPIRE', KEYS[1], 60)
+        end
+        if count > tonumber(ARGV[1]) then
+                return 0
+        end
+end
+for i = 2, #KEYS, 2 do
+        local base = i * 2 - 2
+        redis.call('ZADD', KEYS[i], ARGV[base], ARGV[base + 1])
+        if ARGV[base + 2] ~= '' then
+                redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[base + 2])
+        end
+        redis.call('PUBLISH', KEYS[i + 1], ARGV[base + 1])
+        if ARGV[base + 3] ~= '' then
+                redis.call('EXPIRE', KEYS[i], ARGV[base + 3])
+        end
+end
+return 1
+"""
+_TIMELINE_APPEND_SHA = hashlib.sha1(_TIMELINE_APPEND_LUA.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def get_async_redis() -> AsyncRedis:
+        """Return the process-wide asyncio Redis client backed by a shared connection pool."""
+        pool = AsyncConnectionPool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                decode_responses=False,
+                max_connections=REDIS_MAX_CONNECTIONS,
+        )
+        return AsyncRedis(connection_pool=pool)
+
+
+def _timeline_write(
+        key: str,
+        channel: str,
+        score: int,
+        member: bytes | str,
+        min_score: int | None,
+        ttl_seconds: int | None,
+) -> tuple:
+        """Build the KEYS/ARGV for one timeline append; empty strings skip the prune/expire steps."""
+        return (
+                key,
+                channel,
+                score,
+                member,
+                "" if min_score is None else min_score,
+                "" if ttl_seconds is None else ttl_seconds,
+        )
+
+
+async def _run_timeline_script(client: AsyncRedis, keys: List[str], args: list) -> int:
+        try:
+                return await client.evalsha(_TIMELINE_APPEND_SHA, len(keys), *keys, *args)
+        except NoScriptError:
+                # Script cache is empty (first call or Redis restart); EVAL loads it again.
+                return await client.eval(_TIMELINE_APPEND_LUA, len(keys), *keys, *args)
+
+
+async def _run_timeline_script_batch(client: AsyncRedis, calls: List[Tuple[List[str], list]]) -> list:
+        """Run several timeline script calls on one non-transactional pipeline round-trip.
+
+        Returns one entry per call: the script's reply, or the error Redis replied with.
+        """
+        pipe = client.pipeline(transaction=False)
+        for keys, args in calls:
+                pipe.evalsha(_TIMELINE_APPEND_SHA, len(keys), *keys, *args)
+        results = await pipe.execute(raise_on_error=False)
+
+        missing = [index for index, result in enumerate(results) if isinstance(result, NoScriptError)]
+        if missing:
+                # Only the calls that did not run are retried, so nothing is written twice.
+                pipe = client.pipeline(transaction=False)
+                for index in missing:
+                        keys, args = calls[index]
+                        pipe.eval(_TIMELINE_APPEND_LUA, len(keys), *keys, *args)
+                for index, result in zip(missing, await pipe.execute(raise_on_error=False)):
+                        results[index] = result
+
+        return results
+
+
+async def _append_to_timelines(
+        rate_key: str,
+        rate_limit: int | None,
+        writes: List[tuple],
+) -> bool:
+        """Run timeline appends in one script call; returns False when the agent is rate limited.
+
+        While the ingest batcher is running the call is queued and shares a pipeline with
+        concurrent ingests; otherwise it goes to Redis directly.
+        """
+        keys = [rate_key]
+        args = ["" if rate_limit is None else rate_limit]
+        for key, channel, score, member, min_score, ttl_seconds in writes:
+                keys.extend((key, channel))
+                args.extend((score, member, min_score, ttl_seconds))
+
+        if _ingest_batch_queue is None:
+                return bool(await _run_timeline_script(get_async_redis(), keys, args))
+
+        future = asyncio.get_running_loop().create_future()
+        _ingest_batch_queue.put_nowait((keys, args, future))
+        return bool(await future)
+
+
+async def _flush_ingest_batch(batch: List[tuple]) -> None:
+        try:
+                results = await _run_timeline_script_batch(
+                        get_async_redis(),
+                        [(keys, args) for keys, args, _ in batch],
+                )
+        except Exception as ex:
+                results = [ex] * len(batch)
 
+        for (_, _, future), result in zip(batch, results):
+                if future.done():
+                        # The request was cancelled (client went away) while queued.
+                        continue
+                if isinstance(result, Exception):
+                        future.set_exception(result)
+                else:
+                        future.set_result(result)
 
-def get_redis() -> Redis:
-        return Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
 
+def _drain_ingest_batch(queue: asyncio.Queue, batch: List[tuple]) -> List[tuple]:
+        while len(batch) < _INGEST_BATCH_MAX_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+        return batch
 
-def get_async_redis() -> AsyncRedis:
-        return AsyncRedis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
 
+async def _ingest_batch_loop(queue: asyncio.Queue) -> None:
+        # No fixed wait window: calls that arrive while a pipeline is in flight make up the
+        # next batch, so batches grow with load and an idle ingest is never delayed.
+        while True:
+                await _flush_ingest_batch(_drain_ingest_batch(queue, [await queue.get()]))
 
-def _load_psycopg_modules() -> Tuple[object, object]:
-        try:
-                psycopg = importlib.import_module("psycopg")
-                json_types = importlib.import_module("psycopg.types.json")
-        except ModuleNotFoundError as ex:
-                raise HTTPException(
-                        status_code=500,
-                        detail="PostgreSQL storage configured but psycopg is not installed",
-                ) from ex
 
-        return psycopg, getattr(json_types, "Jsonb")
+def _get_cached_recent_metrics(min_ts: int) -> bytes | None:
+        with _recent_metrics_cache_lock:
+                entry = _recent_metrics_cache.get(min_ts)
+                if entry is None:
+                        return None
+
+                expires_at, body = entry
+                if expires_at <= time.monotonic():
+                        del _recent_metrics_cache[min_ts]
+                        return None
+                return body
+
+
+def _store_cached_recent_metrics(min_ts: int, body: bytes) -> None:
+        with _recent_metrics_cache_lock:
+                _recent_metrics_cache[min_ts] = (time.monotonic() + _RECENT_METRICS_CACHE_TTL_SECONDS, body)
+                while len(_recent_metrics_cache) > _RECENT_METRICS_CACHE_MAX_ENTRIES:
+                        # Dicts keep insertion order, so the first key is the oldest window.
+                        del _recent_metrics_cache[next(iter(_recent_metrics_cache))]
+
+
+def _valid_metric_entries(items: List[bytes]) -> List[bytes]:
+        # Entries were serialized by ingest, so once an entry decodes against the schema
+        # its stored JSON bytes are emitted as-is instead of being re-encoded.
+        valid: List[bytes] = []
+        for item in items:
+                try:
+                        _METRICS_DECODER.decode(item)
+                except msgspec.DecodeError:
+                        continue
+                valid.append(item)
+        return valid
+
+
+async def _stream_recent_metrics(
+        client: AsyncRedis,
+        min_ts: int,
+        first_page: List[Tuple[bytes, float]],
+) -> AsyncIterator[bytes]:
+        yield b"["
+        page = first_page
+        requested = _RECENT_METRICS_PAGE_SIZE
+        # Pages are read by score, not rank: ingest prunes the head of the set while this streams,
+        # which would shift rank offsets. Each read starts again at the last score returned, and the
+        # members already sent at that score are dropped by identity.
+        resume_score = min_ts
+        sent_at_resume: Set[bytes] = set()
+        separator = b""
+        while True:
+                fresh = [
+                        (member, score)
+                        for member, score in page
+                        if int(score) != resume_score or member not in sent_at_resume
+                ]
+                valid = _valid_metric_entries([member for member, _ in fresh])
+                if valid:
+                        yield separator + b",".join(valid)
+                        separator = b","
+
+                if len(page) < requested or not fresh:
+                        break
+
+                last_score = int(fresh[-1][1])
+                if last_score != resume_score:
+                        resume_score, sent_at_resume = last_score, set()
+                sent_at_resume.update(member for member, score in fresh if int(score) == last_score)
+                requested = _RECENT_METRICS_PAGE_SIZE + len(sent_at_resume)
+                try:
+                        page = await client.zrangebyscore(
+                                METRICS_KEY,
+                                resume_score,
+                                "+inf",
+                                start=0,
+                                num=requested,
+                                withscores=True,
+                        )
+                except RedisError as ex:
+                        # Headers are already sent, so close the array with what was streamed.
+                        logger.warning("Recent metrics stream ended early: %s", str(ex))
+                        break
+        yield b"]"
+
+
+def _broadcast_metrics_frame(frame: bytes) -> None:
+        for queue in tuple(_metrics_subscribers):
+                if queue.full():
+                        # A slow client drops its oldest frame rather than stalling everyone else.
+                        queue.get_nowait()
+                queue.put_nowait(frame)
+
+
+async def _metrics_broadcast_loop() -> None:
+        """Relay the Redis metrics channel to every websocket client from one subscription."""
+        while True:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                try:
+                        await pubsub.subscribe(METRICS_CHANNEL)
+                        while True:
+                                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                                if message is None:
+                                        continue
+                                # Forward the published JSON bytes as a binary frame without re-encoding them.
+                                _broadcast_metrics_frame(message["data"])
+                except RedisError as ex:
+                        logger.warning("Metrics broadcast subscription failed: %s", str(ex))
+                        await asyncio.sleep(_METRICS_BROADCAST_RETRY_SECONDS)
+                except Exception:
+                        # This one task feeds every websocket client, so never let it die; cancellation
+                        # is a BaseException and still stops it.
+                        logger.exception("Metrics broadcast loop failed; resubscribing")
+                        await asyncio.sleep(_METRICS_BROADCAST_RETRY_SECONDS)
+                finally:
+                        try:
+                                await pubsub.aclose()
+                        except Exception:
+                                pass
+
+
+def _get_postgres_pool():
+        """Return the process-wide PostgreSQL connection pool, creating it on first use."""
+        global _postgres_pool
+        if _postgres_pool is not None:
+                return _postgres_pool
+
+        with _postgres_pool_lock:
+                if _postgres_pool is None:
+                        if _PSYCOPG_POOL is None:
+                                raise HTTPException(
+                                        status_code=500,
+                                        detail="PostgreSQL storage configured but psycopg_pool is not installed",
+                                )
+
+                        # New connections run the schema check once, so requests never pay for it.
+                        _postgres_pool = _PSYCOPG_POOL.ConnectionPool(
+                                POSTGRES_DSN,
+                                min_size=POSTGRES_POOL_MIN_SIZE,
+                                max_size=POSTGRES_POOL_MAX_SIZE,
+                                timeout=_POSTGRES_POOL_TIMEOUT_SECONDS,
+                                kwargs={"autocommit": True},
+                                configure=_ensure_postgres_schema,
+                                open=True,
+                        )
+
+        return _postgres_pool
 
 
 def _resolve_postgres_table_name() -> str:
@@ -76,41 +412,92 @@ def _resolve_postgres_table_name() -> str:
         return "metrics_snapshots"
 
 
+# POSTGRES_TABLE is fixed at startup, so validate it and build every statement once.
+_POSTGRES_TABLE_NAME = _resolve_postgres_table_name()
+_POSTGRES_SCHEMA_SQL = (
+        f"""
+        CREATE TABLE IF NOT EXISTS {_POSTGRES_TABLE_NAME} (
+                id BIGSERIAL PRIMARY KEY,
+                timestamp_utc TIMESTAMPTZ NOT NULL,
+                epoch_seconds BIGINT NOT NULL,
+                total_cpu_percent DOUBLE PRECISION NOT NULL,
+                per_core_cpu_percent DOUBLE PRECISION[] NOT NULL DEFAULT '{{}}',
+                system_memory_total_mb DOUBLE PRECISION NOT NULL DEFAULT 0,
+                system_memory_used_mb DOUBLE PRECISION NOT NULL DEFAULT 0,
+                top_processes JSONB NOT NULL DEFAULT '[]'::jsonb,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_{_POSTGRES_TABLE_NAME}_timestamp_utc
+        ON {_POSTGRES_TABLE_NAME} (timestamp_utc DESC)
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_{_POSTGRES_TABLE_NAME}_created_at
+        ON {_POSTGRES_TABLE_NAME} (created_at DESC)
+        """,
+)
+_POSTGRES_PER_CORE_TYPE_SQL = """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'per_core_cpu_percent'
+"""
+# Converts a per_core_cpu_percent column created as JSONB; '[1.5, 2.0]' and '{1.5, 2.0}' differ
+# only in their brackets. The type change rewrites the table under an ACCESS EXCLUSIVE lock, so it
+# only runs when POSTGRES_MIGRATE_PER_CORE_ARRAY is set.
+_POSTGRES_PER_CORE_MIGRATION_SQL = (
+        f"ALTER TABLE {_POSTGRES_TABLE_NAME} ALTER COLUMN per_core_cpu_percent DROP DEFAULT",
+        f"""
+        ALTER TABLE {_POSTGRES_TABLE_NAME} ALTER COLUMN per_core_cpu_percent
+                TYPE DOUBLE PRECISION[]
+                USING translate(per_core_cpu_percent::text, '[]', '{{}}')::double precision[]
+        """,
+        f"ALTER TABLE {_POSTGRES_TABLE_NAME} ALTER COLUMN per_core_cpu_percent SET DEFAULT '{{}}'",
+)
+_POSTGRES_COPY_SQL = f"""
+        COPY {_POSTGRES_TABLE_NAME} (
+                timestamp_utc,
+                epoch_seconds,
+                total_cpu_percent,
+                per_core_cpu_percent,
+                system_memory_total_mb,
+                system_memory_used_mb,
+                top_processes
+        ) FROM STDIN
+"""
+_POSTGRES_RETENTION_SQL = f"DELETE FROM {_POSTGRES_TABLE_NAME} WHERE timestamp_utc < %s"
+
+
 def _ensure_postgres_schema(connection) -> None:
-        global _postgres_schema_ready
+        global _postgres_schema_ready, _postgres_per_core_jsonb
         if _postgres_schema_ready:
                 return
 
-        table_name = _resolve_postgres_table_name()
         with connection.cursor() as cursor:
-                cursor.execute(
-                        f"""
-                        CREATE TABLE IF NOT EXISTS {table_name} (
-                                id BIGSERIAL PRIMARY KEY,
-                                timestamp_utc TIMESTAMPTZ NOT NULL,
-                                epoch_seconds BIGINT NOT NULL,
-                                total_cpu_percent DOUBLE PRECISION NOT NULL,
-                                per_core_cpu_percent JSONB NOT NULL DEFAULT '[]'::jsonb,
-                                system_memory_total_mb DOUBLE PRECISION NOT NULL DEFAULT 0,
-                                system_memory_used_mb DOUBLE PRECISION NOT NULL DEFAULT 0,
-                                top_processes JSONB NOT NULL DEFAULT '[]'::jsonb,
-                                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                for statement in _POSTGRES_SCHEMA_SQL:
+                        cursor.execute(statement)
+
+                cursor.execute(_POSTGRES_PER_CORE_TYPE_SQL, (_POSTGRES_TABLE_NAME.lower(),))
+                row = cursor.fetchone()
+                legacy = row is not None and row[0] == "jsonb"
+                if legacy and POSTGRES_MIGRATE_PER_CORE_ARRAY:
+                        logger.warning(
+                                "Migrating %s.per_core_cpu_percent from JSONB to DOUBLE PRECISION[]; "
+                                "the table is locked until the rewrite finishes",
+                                _POSTGRES_TABLE_NAME,
+                        )
+                        with connection.transaction():
+                                for statement in _POSTGRES_PER_CORE_MIGRATION_SQL:
+                                        cursor.execute(statement)
+                        logger.warning("Migrated %s.per_core_cpu_percent", _POSTGRES_TABLE_NAME)
+                        legacy = False
+                elif legacy:
+                        logger.warning(
+                                "%s.per_core_cpu_percent is still JSONB; rows are written as JSONB until "
+                                "POSTGRES_MIGRATE_PER_CORE_ARRAY=true converts it",
+                                _POSTGRES_TABLE_NAME,
                         )
-                        """
-                )
-                cursor.execute(
-                        f"""
-                        CREATE INDEX IF NOT EXISTS idx_{table_name}_timestamp_utc
-                        ON {table_name} (timestamp_utc DESC)
-                        """
-                )
-                cursor.execute(
-                        f"""
-                        CREATE INDEX IF NOT EXISTS idx_{table_name}_created_at
-                        ON {table_name} (created_at DESC)
-                        """
-                )
 
+        _postgres_per_core_jsonb = legacy
         _postgres_schema_ready = True
 
 
@@ -118,80 +505,132 @@ def check_postgres_connection() -> None:
         if not POSTGRES_DSN:
                 return
 
-        psycopg, _ = _load_psycopg_modules()
+        pool = _get_postgres_pool()
         try:
-                with psycopg.connect(POSTGRES_DSN, autocommit=True) as connection:
-                        _ensure_postgres_schema(connection)
+                with pool.connection() as connection:
+                        connection.execute("SELECT 1")
         except Exception as ex:
                 raise HTTPException(status_code=503, detail=f"PostgreSQL unavailable: {str(ex)}") from ex
 
 
-def apply_postgres_retention_policy(reference_time: datetime) -> None:
-        global _last_postgres_prune_epoch
-
+def apply_postgres_retention_policy(epoch_now: int) -> None:
         if not POSTGRES_DSN or POSTGRES_RETENTION_DAYS <= 0:
                 return
 
-        epoch_now = int(reference_time.timestamp())
-        if epoch_now - _last_postgres_prune_epoch < 60:
-                return
-
         try:
-                psycopg, _ = _load_psycopg_modules()
-                cutoff = reference_time - timedelta(days=POSTGRES_RETENTION_DAYS)
-                table_name = _resolve_postgres_table_name()
+                pool = _get_postgres_pool()
+                cutoff = datetime.fromtimestamp(epoch_now - POSTGRES_RETENTION_DAYS * 86400, tz=timezone.utc)
 
-                with psycopg.connect(POSTGRES_DSN, autocommit=True) as connection:
-                        _ensure_postgres_schema(connection)
+                with pool.connection() as connection:
                         with connection.cursor() as cursor:
-                                cursor.execute(
-                                        f"DELETE FROM {table_name} WHERE timestamp_utc < %s",
-                                        (cutoff,),
-                                )
-
-                _last_postgres_prune_epoch = epoch_now
+                                # Pooled connections live for the whole process, so keep this server-side prepared.
+                                cursor.execute(_POSTGRES_RETENTION_SQL, (cutoff,), prepare=True)
         except Exception as ex:
                 logger.warning("PostgreSQL retention policy check failed: %s", str(ex))
 
 
-def store_metrics_in_postgres(payload: MetricsPayload) -> None:
+def store_metrics_in_postgres(payload: MetricsPayload, snapshot: dict) -> None:
+        """Queue a snapshot row for the background PostgreSQL COPY flusher.
+
+        ``snapshot`` is the ``payload.model_dump()`` already built for Redis, reused so the
+        process list is not dumped a second time.
+        """
         if not POSTGRES_DSN:
                 return
 
-        psycopg, json_wrapper = _load_psycopg_modules()
-        table_name = _resolve_postgres_table_name()
+        if not _PSYCOPG_OK:
+                raise HTTPException(
+                        status_code=500,
+                        detail="PostgreSQL storage configured but psycopg is not installed",
+                )
+
         snapshot_time = datetime.fromtimestamp(payload.timestamp, tz=timezone.utc)
-        top_processes = [process.model_dump() for process in payload.top_processes]
 
-        try:
-                with psycopg.connect(POSTGRES_DSN, autocommit=True) as connection:
-                        _ensure_postgres_schema(connection)
-                        with connection.cursor() as cursor:
-                                cursor.execute(
-                                        f"""
-                                        INSERT INTO {table_name} (
-                                                timestamp_utc,
-                                                epoch_seconds,
-                                                total_cpu_percent,
-                                                per_core_cpu_percent,
-                                                system_memory_total_mb,
-                                                system_memory_used_mb,
-                                                top_processes
-                                        )
-                                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                        """,
-                                        (
-                                                snapshot_time,
-                                                payload.timestamp,
-                                                payload.total_cpu_percent,
-                                                json_wrapper(payload.per_core_cpu_percent),
-                                                payload.system_memory_total_mb,
-                                                payload.system_memory_used_mb,
-                                                json_wrapper(top_processes),
-                                        ),
-                                )
-        except Exception as ex:
-                raise HTTPException(status_code=503, detail=f"PostgreSQL unavailable: {str(ex)}") from ex
+        if len(_postgres_buffer) >= _POSTGRES_BUFFER_MAX_ROWS:
+                # The append below pushes out the oldest queued row.
+                _count_dropped_postgres_rows(1)
+        _postgres_buffer.append(
+                (
+                        snapshot_time,
+                        payload.timestamp,
+                        payload.total_cpu_percent,
+                        snapshot["per_core_cpu_percent"],
+                        payload.system_memory_total_mb,
+                        payload.system_memory_used_mb,
+                        _JSONB(snapshot["top_processes"]),
+                )
+        )
+        if _postgres_flush_wakeup is not None and len(_postgres_buffer) >= _POSTGRES_FLUSH_BATCH_SIZE:
+                _postgres_flush_wakeup.set()
+
+
+def _count_dropped_postgres_rows(count: int) -> None:
+        global _postgres_dropped_rows
+
+        with _postgres_dropped_rows_lock:
+                _postgres_dropped_rows += count
+
+
+def _log_dropped_postgres_rows() -> None:
+        global _postgres_dropped_rows
+
+        with _postgres_dropped_rows_lock:
+                dropped, _postgres_dropped_rows = _postgres_dropped_rows, 0
+        if dropped:
+                logger.warning(
+                        "PostgreSQL buffer full (%d rows); dropped %d snapshot rows",
+                        _POSTGRES_BUFFER_MAX_ROWS,
+                        dropped,
+                )
+
+
+def flush_postgres_buffer() -> None:
+        """Write queued snapshot rows to PostgreSQL in COPY batches."""
+        if not _postgres_buffer:
+                return
+
+        while _postgres_buffer:
+                batch = []
+                while _postgres_buffer and len(batch) < _POSTGRES_FLUSH_BATCH_SIZE:
+                        batch.append(_postgres_buffer.popleft())
+
+                try:
+                        pool = _get_postgres_pool()
+                        with pool.connection() as connection:
+                                with connection.cursor() as cursor:
+                                        with cursor.copy(_POSTGRES_COPY_SQL) as copy:
+                                                for row in batch:
+                                                        if _postgres_per_core_jsonb:
+                                                                row = (*row[:3], _JSONB(row[3]), *row[4:])
+                                                        copy.write_row(row)
+                except Exception as ex:
+                        # Keep the rows for the next flush. Ingest keeps appending meanwhile, so if the
+                        # buffer filled up, re-queueing at the front drops rows from the newest end.
+                        overflow = len(_postgres_buffer) + len(batch) - _POSTGRES_BUFFER_MAX_ROWS
+                        if overflow > 0:
+                                _count_dropped_postgres_rows(overflow)
+                        _postgres_buffer.extendleft(reversed(batch))
+                        logger.warning("PostgreSQL batch insert failed: %s", str(ex))
+                        return
+
+
+async def _postgres_retention_loop() -> None:
+        while True:
+                await asyncio.sleep(_POSTGRES_RETENTION_INTERVAL_SECONDS)
+                await asyncio.to_thread(apply_postgres_retention_policy, int(time.time()))
+
+
+async def _postgres_flush_loop(wakeup: asyncio.Event) -> None:
+        while True:
+                try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=_POSTGRES_FLUSH_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                        pass
+                wakeup.clear()
+                if _postgres_buffer:
+                        await asyncio.to_thread(flush_postgres_buffer)
+                # Reported once per cycle so an outage logs a running total, not one line per row.
+                _log_dropped_postgres_rows()
 
 
 def _agent_client_id(request: Request) -> str:
@@ -208,40 +647,31 @@ def enforce_agent_auth(x_agent_token: str | None) -> None:
                 raise HTTPException(status_code=401, detail="Invalid or missing agent token")
 
 
-def enforce_rate_limit(client_id: str, request_time_epoch: int) -> None:
-        if AGENT_RATE_LIMIT_PER_MINUTE <= 0:
-                return
-
-        with _rate_limit_lock:
-                window = _agent_rate_windows[client_id]
-                lower_bound = request_time_epoch - 60
-                while window and window[0] < lower_bound:
-                        window.popleft()
+def _rate_limit_key(client_id: str, request_time_epoch: int) -> str:
+        # One counter per agent per clock minute, shared by every backend worker and replica.
+        return f"{RATE_LIMIT_KEY_PREFIX}:{client_id}:{request_time_epoch // 60}"
 
-                if len(window) >= AGENT_RATE_LIMIT_PER_MINUTE:
-                        raise HTTPException(status_code=429, detail="Agent rate limit exceeded")
 
-                window.append(request_time_epoch)
+def _alert_timeline_write(alert: bytes, alert_timestamp: int, now_epoch: int) -> tuple:
+        return _timeline_write(
+                ALERTS_KEY,
+                ALERTS_CHANNEL,
+                alert_timestamp,
+                alert,
+                now_epoch - ALERT_RETENTION_SECONDS,
+                ALERT_RETENTION_SECONDS * 2,
+        )
 
 
-def publish_alert(alert: AlertEvent) -> None:
-        try:
-                client = get_redis()
-                serialized = alert.model_dump_json()
-                min_ts = int((datetime.now(timezone.utc) - timedelta(seconds=ALERT_RETENTION_SECONDS)).timestamp())
-
-                pipe = client.pipeline()
-                pipe.zadd(ALERTS_KEY, {serialized: alert.timestamp})
-                pipe.zremrangebyscore(ALERTS_KEY, "-inf", min_ts)
-                pipe.expire(ALERTS_KEY, ALERT_RETENTION_SECONDS * 2)
-                if hasattr(pipe, "publish"):
-                        pipe.publish(ALERTS_CHANNEL, serialized)
-                pipe.execute()
-        except RedisError as ex:
-                logger.warning("Alert publish failed: %s", str(ex))
+# The alert thresholds are fixed at startup, so the rule's message is too.
+_CPU_ALERT_MESSAGE = (
+        f"CPU usage remained above {ALERT_CPU_THRESHOLD:.2f}% "
+        f"for at least {ALERT_CPU_DURATION_SECONDS} seconds"
+)
 
 
-def evaluate_cpu_alert_rule(payload: MetricsPayload) -> AlertEvent | None:
+def evaluate_cpu_alert_rule(payload: MetricsPayload) -> bytes | None:
+        """Advance the CPU threshold-duration rule; returns the serialized AlertEvent when it fires."""
         global _high_cpu_window_start_ts, _high_cpu_alert_active
 
         with _alert_state_lock:
@@ -253,16 +683,16 @@ def evaluate_cpu_alert_rule(payload: MetricsPayload) -> AlertEvent | None:
                         elapsed = payload.timestamp - _high_cpu_window_start_ts
                         if elapsed >= ALERT_CPU_DURATION_SECONDS and not _high_cpu_alert_active:
                                 _high_cpu_alert_active = True
-                                return AlertEvent(
-                                        timestamp=payload.timestamp,
-                                        rule="cpu_threshold_duration",
-                                        severity="warning",
-                                        message=(
-                                                f"CPU usage remained above {ALERT_CPU_THRESHOLD:.2f}% "
-                                                f"for at least {ALERT_CPU_DURATION_SECONDS} seconds"
-                                        ),
-                                        current_value=current_cpu,
-                                        threshold=ALERT_CPU_THRESHOLD,
+                                # Built by this service with known types, so skip AlertEvent validation.
+                                return orjson.dumps(
+                                        {
+                                                "timestamp": payload.timestamp,
+                                                "rule": "cpu_threshold_duration",
+                                                "severity": "warning",
+                                                "message": _CPU_ALERT_MESSAGE,
+                                                "current_value": current_cpu,
+                                                "threshold": float(ALERT_CPU_THRESHOLD),
+                                        }
                                 )
                         return None
 
@@ -271,6 +701,13 @@ def evaluate_cpu_alert_rule(payload: MetricsPayload) -> AlertEvent | None:
                 return None
 
 
+def _rearm_cpu_alert() -> None:
+        global _high_cpu_alert_active
+
+        with _alert_state_lock:
+                _high_cpu_alert_active = False
+
+
 @app.on_event("startup")
 def initialize_postgres_schema() -> None:
         if not POSTGRES_DSN:
@@ -287,9 +724,6 @@ def shutdown_cleanup() -> None:
         """Release in-memory runtime state during graceful shutdown."""
         global _high_cpu_window_start_ts, _high_cpu_alert_active
 
-        with _rate_limit_lock:
-                _agent_rate_windows.clear()
-
         with _alert_state_lock:
                 _high_cpu_window_start_ts = None
                 _high_cpu_alert_active = False
@@ -297,16 +731,131 @@ def shutdown_cleanup() -> None:
         logger.info("Backend shutdown cleanup completed")
 
 
+@app.on_event("startup")
+async def start_postgres_flusher() -> None:
+        global _postgres_flush_task, _postgres_flush_wakeup
+        if not POSTGRES_DSN:
+                return
+
+        _postgres_flush_wakeup = asyncio.Event()
+        _postgres_flush_task = asyncio.create_task(_postgres_flush_loop(_postgres_flush_wakeup))
+
+
+@app.on_event("shutdown")
+async def stop_postgres_flusher() -> None:
+        """Stop the background flusher and write any rows still queued."""
+        global _postgres_flush_task, _postgres_flush_wakeup
+
+        _postgres_flush_wakeup = None
+        if _postgres_flush_task is not None:
+                _postgres_flush_task.cancel()
+                try:
+                        await _postgres_flush_task
+                except asyncio.CancelledError:
+                        pass
+                _postgres_flush_task = None
+
+        if _postgres_buffer:
+                await asyncio.to_thread(flush_postgres_buffer)
+
+
+@app.on_event("startup")
+async def start_postgres_retention() -> None:
+        global _postgres_retention_task
+        if not POSTGRES_DSN or POSTGRES_RETENTION_DAYS <= 0:
+                return
+
+        # Pruning runs on its own timer so a slow DELETE never lands on an ingest request.
+        _postgres_retention_task = asyncio.create_task(_postgres_retention_loop())
+
+
+@app.on_event("shutdown")
+async def stop_postgres_retention() -> None:
+        global _postgres_retention_task
+
+        if _postgres_retention_task is not None:
+                _postgres_retention_task.cancel()
+                try:
+                        await _postgres_retention_task
+                except asyncio.CancelledError:
+                        pass
+                _postgres_retention_task = None
+
+
+@app.on_event("startup")
+async def start_metrics_broadcast() -> None:
+        global _metrics_broadcast_task
+        _metrics_broadcast_task = asyncio.create_task(_metrics_broadcast_loop())
+
+
+@app.on_event("shutdown")
+async def stop_metrics_broadcast() -> None:
+        global _metrics_broadcast_task
+
+        if _metrics_broadcast_task is not None:
+                _metrics_broadcast_task.cancel()
+                try:
+                        await _metrics_broadcast_task
+                except asyncio.CancelledError:
+                        pass
+                _metrics_broadcast_task = None
+
+
+@app.on_event("startup")
+async def start_ingest_batcher() -> None:
+        global _ingest_batch_queue, _ingest_batch_task
+
+        _ingest_batch_queue = asyncio.Queue()
+        _ingest_batch_task = asyncio.create_task(_ingest_batch_loop(_ingest_batch_queue))
+
+
+@app.on_event("shutdown")
+async def stop_ingest_batcher() -> None:
+        """Stop the ingest batcher and flush any script calls still queued."""
+        global _ingest_batch_queue, _ingest_batch_task
+
+        queue = _ingest_batch_queue
+        _ingest_batch_queue = None
+        if _ingest_batch_task is not None:
+                _ingest_batch_task.cancel()
+                try:
+                        await _ingest_batch_task
+                except asyncio.CancelledError:
+                        pass
+                _ingest_batch_task = None
+
+        while queue is not None and not queue.empty():
+                await _flush_ingest_batch(_drain_ingest_batch(queue, []))
+
+
+@app.on_event("shutdown")
+def close_postgres_pool() -> None:
+        """Close the shared PostgreSQL connection pool on graceful shutdown."""
+        global _postgres_pool
+
+        with _postgres_pool_lock:
+                if _postgres_pool is not None:
+                        _postgres_pool.close()
+                        _postgres_pool = None
+
+
+@app.on_event("shutdown")
+async def close_redis_clients() -> None:
+        """Disconnect the shared Redis connection pool on graceful shutdown."""
+        if get_async_redis.cache_info().currsize:
+                await get_async_redis().connection_pool.disconnect()
+                get_async_redis.cache_clear()
+
+
 @app.get(
         "/health",
         response_model=HealthResponse,
         summary="Service health",
         description="Returns connectivity status for Redis and PostgreSQL.",
 )
-def health_check() -> dict:
+async def health_check() -> dict:
         try:
-                client = get_redis()
-                client.ping()
+                await get_async_redis().ping()
                 response = {"status": "ok", "redis": "connected"}
         except RedisError:
                 response = {"status": "degraded", "redis": "disconnected"}
@@ -316,7 +865,7 @@ def health_check() -> dict:
                 return response
 
         try:
-                check_postgres_connection()
+                await asyncio.to_thread(check_postgres_connection)
                 response["postgres"] = "connected"
         except HTTPException:
                 response["postgres"] = "disconnected"
@@ -330,90 +879,199 @@ def health_check() -> dict:
         summary="Ingest metrics snapshot",
         description="Receives metrics from the agent, applies auth/rate limits, stores in Redis/PostgreSQL, and evaluates alerts.",
 )
-def ingest_metrics(
+async def ingest_metrics(
         payload: MetricsPayload,
         request: Request,
         x_agent_token: str | None = Header(default=None, alias="X-Agent-Token"),
 ) -> dict:
-        now = datetime.now(timezone.utc)
-        now_epoch = int(now.timestamp())
-        min_ts = int((now - timedelta(seconds=RETENTION_SECONDS)).timestamp())
+        global _last_metrics_prune_epoch, _last_metrics_expire_epoch
+
+        now_epoch = int(time.time())
+        min_ts = now_epoch - RETENTION_SECONDS
 
         enforce_agent_auth(x_agent_token)
-        enforce_rate_limit(_agent_client_id(request), now_epoch)
 
+        # Pruning and TTL refresh only need to run occasionally, not on every ingest.
+        prune_due = now_epoch - _last_metrics_prune_epoch >= _METRICS_PRUNE_INTERVAL_SECONDS
+        expire_due = now_epoch - _last_metrics_expire_epoch >= _METRICS_EXPIRE_REFRESH_SECONDS
+
+        snapshot = payload.model_dump()
+        write = _timeline_write(
+                METRICS_KEY,
+                METRICS_CHANNEL,
+                payload.timestamp,
+                orjson.dumps(snapshot),
+                min_ts if prune_due else None,
+                RETENTION_SECONDS * 2 if expire_due else None,
+        )
+        rate_key = _rate_limit_key(_agent_client_id(request), now_epoch)
+
+        # The rate-limit check and the snapshot go to Redis in one atomic script call. An ingest
+        # that raises an alert makes a second call below, so most ingests take one round-trip and
+        # alerting ones take two.
         try:
-                client = get_redis()
-                serialized = payload.model_dump_json()
-
-                pipe = client.pipeline()
-                pipe.zadd(METRICS_KEY, {serialized: payload.timestamp})
-                pipe.zremrangebyscore(METRICS_KEY, "-inf", min_ts)
-                if hasattr(pipe, "publish"):
-                        pipe.publish(METRICS_CHANNEL, serialized)
-                pipe.expire(METRICS_KEY, RETENTION_SECONDS * 2)
-                pipe.execute()
+                accepted = await _append_to_timelines(
+                        rate_key,
+                        AGENT_RATE_LIMIT_PER_MINUTE if AGENT_RATE_LIMIT_PER_MINUTE > 0 else None,
+                        [write],
+                )
         except RedisError as ex:
                 raise HTTPException(status_code=503, detail=f"Redis unavailable: {str(ex)}") from ex
 
-        store_metrics_in_postgres(payload)
-        apply_postgres_retention_policy(now)
+        if not accepted:
+                raise HTTPException(status_code=429, detail="Agent rate limit exceeded")
+
+        if prune_due:
+                _last_metrics_prune_epoch = now_epoch
+        if expire_due:
+                _last_metrics_expire_epoch = now_epoch
 
+        # Only stored snapshots advance the alert rule, so rejected or failed ingests never
+        # move its window or consume an alert. That is why the alert cannot share the snapshot's
+        # script call: the rule has to run after the gate accepted the snapshot. The alert write
+        # itself is not rate limited.
         alert = evaluate_cpu_alert_rule(payload)
         if alert is not None:
-                publish_alert(alert)
+                try:
+                        await _append_to_timelines(
+                                rate_key,
+                                None,
+                                [_alert_timeline_write(alert, payload.timestamp, now_epoch)],
+                        )
+                except RedisError as ex:
+                        # The snapshot is already stored; let the next high-CPU snapshot raise the alert again.
+                        _rearm_cpu_alert()
+                        logger.warning("CPU alert could not be stored: %s", str(ex))
+
+        store_metrics_in_postgres(payload, snapshot)
 
         return {"status": "accepted", "timestamp": payload.timestamp}
 
 
+def _resume_position(page: List[Tuple[bytes, float]], start_score: int, skip: int) -> Tuple[int, int]:
+        """Return the (score, skip) position right after ``page``, a withscores ZRANGEBYSCORE reply.
+
+        Several agents can report in the same second, so the next read starts at the last score
+        again and skips the members at that score that were already returned.
+        """
+        last_score = int(page[-1][1])
+        seen_at_last = 0
+        for _, score in reversed(page):
+                if int(score) != last_score:
+                        break
+                seen_at_last += 1
+        if last_score == start_score:
+                seen_at_last += skip
+        return last_score, seen_at_last
+
+
+async def _get_recent_metrics_page(start_ts: int, skip: int, limit: int) -> Response:
+        """Return up to ``limit`` snapshots from ``start_ts`` on, oldest first.
+
+        ``skip`` members at ``start_ts`` are passed over. When the page is full,
+        ``X-Next-Cursor`` carries the ``cursor`` for the next page.
+        """
+        try:
+                page = await get_async_redis().zrangebyscore(
+                        METRICS_KEY,
+                        start_ts,
+                        "+inf",
+                        start=skip,
+                        num=limit,
+                        withscores=True,
+                )
+        except RedisError as ex:
+                raise HTTPException(status_code=503, detail=f"Redis unavailable: {str(ex)}") from ex
+
+        body = b"[" + b",".join(_valid_metric_entries([member for member, _ in page])) + b"]"
+        headers = {}
+        if len(page) == limit:
+                next_score, next_skip = _resume_position(page, start_ts, skip)
+                headers["X-Next-Cursor"] = f"{next_score}:{next_skip}"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get(
         "/api/metrics/recent",
         response_model=List[MetricsPayload],
         summary="Recent metrics",
-        description="Returns metric snapshots retained in the active Redis rolling window.",
+        description=(
+                "Returns metric snapshots retained in the active Redis rolling window. Pass `limit` "
+                "and/or `cursor_ts` to page through it oldest first; full pages return the `cursor` "
+                "for the next page in the `X-Next-Cursor` header."
+        ),
 )
-def get_recent_metrics() -> List[MetricsPayload]:
-        now = datetime.now(timezone.utc)
-        min_ts = int((now - timedelta(seconds=RETENTION_SECONDS)).timestamp())
+async def get_recent_metrics(
+        limit: int | None = Query(default=None, ge=1, le=5000),
+        cursor_ts: int | None = Query(default=None, ge=0),
+        cursor: str | None = Query(default=None, pattern=r"^\d+:\d+$"),
+) -> Response:
+        min_ts = int(time.time()) - RETENTION_SECONDS
+        if limit is not None or cursor_ts is not None or cursor is not None:
+                start_ts, skip = max(min_ts, cursor_ts or 0), 0
+                if cursor is not None:
+                        cursor_score, cursor_skip = (int(part) for part in cursor.split(":"))
+                        # A cursor whose score has aged out of the window restarts at the window's start.
+                        if cursor_score >= min_ts:
+                                start_ts, skip = cursor_score, cursor_skip
+                return await _get_recent_metrics_page(start_ts, skip, limit or _RECENT_METRICS_PAGE_SIZE)
+
+        cached = _get_cached_recent_metrics(min_ts)
+        if cached is not None:
+                return Response(content=cached, media_type="application/json")
 
         try:
-                client = get_redis()
-                data = client.zrangebyscore(METRICS_KEY, min_ts, "+inf")
+                client = get_async_redis()
+                first_page = await client.zrangebyscore(
+                        METRICS_KEY,
+                        min_ts,
+                        "+inf",
+                        start=0,
+                        num=_RECENT_METRICS_PAGE_SIZE,
+                        withscores=True,
+                )
         except RedisError as ex:
                 raise HTTPException(status_code=503, detail=f"Redis unavailable: {str(ex)}") from ex
 
-        parsed: List[MetricsPayload] = []
-        for item in data:
-                try:
-                        parsed.append(MetricsPayload.model_validate_json(item))
-                except (ValueError, json.JSONDecodeError):
-                        continue
+        if len(first_page) < _RECENT_METRICS_PAGE_SIZE:
+                body = b"[" + b",".join(_valid_metric_entries([member for member, _ in first_page])) + b"]"
+                _store_cached_recent_metrics(min_ts, body)
+                return Response(content=body, media_type="application/json")
 
-        return parsed
+        # Long retention windows are streamed page by page so memory stays bounded.
+        return StreamingResponse(
+                _stream_recent_metrics(client, min_ts, first_page),
+                media_type="application/json",
+        )
 
 
 @app.get(
         "/api/alerts/recent",
         response_model=List[AlertEvent],
+        response_class=ORJSONResponse,
         summary="Recent alerts",
         description="Returns alert events from Redis within the requested recent window.",
 )
-def get_recent_alerts(minutes: int = Query(default=60, ge=1, le=1440)) -> List[AlertEvent]:
-        now = datetime.now(timezone.utc)
-        min_ts = int((now - timedelta(minutes=minutes)).timestamp())
+async def get_recent_alerts(minutes: int = Query(default=60, ge=1, le=1440)) -> List[AlertEvent]:
+        min_ts = int(time.time()) - minutes * 60
 
         try:
-                client = get_redis()
-                raw_alerts = client.zrangebyscore(ALERTS_KEY, min_ts, "+inf")
+                raw_alerts = await get_async_redis().zrangebyscore(ALERTS_KEY, min_ts, "+inf")
         except RedisError as ex:
                 raise HTTPException(status_code=503, detail=f"Redis unavailable: {str(ex)}") from ex
 
         parsed: List[AlertEvent] = []
         for item in raw_alerts:
                 try:
-                        parsed.append(AlertEvent.model_validate_json(item))
-                except (ValueError, json.JSONDecodeError):
+                        record = orjson.loads(item)
+                except orjson.JSONDecodeError:
+                        continue
+
+                # Alerts are written by this service, so skip re-validation and only
+                # drop entries that are missing fields.
+                if not isinstance(record, dict) or not _ALERT_FIELDS.issubset(record):
                         continue
+                parsed.append(AlertEvent.model_construct(**record))
 
         return parsed
 
@@ -421,24 +1079,18 @@ def get_recent_alerts(minutes: int = Query(default=60, ge=1, le=1440)) -> List[A
 @app.websocket("/ws/metrics")
 async def metrics_updates_ws(websocket: WebSocket) -> None:
         await websocket.accept()
-        client = get_async_redis()
-        pubsub = client.pubsub()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_WS_CLIENT_QUEUE_SIZE)
+        _metrics_subscribers.add(queue)
 
         try:
-                await pubsub.subscribe(METRICS_CHANNEL)
-                async for message in pubsub.listen():
-                        if message.get("type") != "message":
-                                continue
-                        payload = message.get("data")
-                        if payload is None:
-                                continue
-                        await websocket.send_text(str(payload))
-        except (WebSocketDisconnect, RedisError):
+                while True:
+                        frames = [await queue.get()]
+                        while len(frames) < _WS_BATCH_MAX_FRAMES and not queue.empty():
+                                frames.append(queue.get_nowait())
+                        # Snapshots that queued up while the previous send was in flight go out
+                        # together as one JSON array frame.
+                        await websocket.send_bytes(b"[" + b",".join(frames) + b"]")
+        except WebSocketDisconnect:
                 pass
         finally:
-                try:
-                        await pubsub.unsubscribe(METRICS_CHANNEL)
-                        await pubsub.close()
-                        await client.aclose()
-                except RedisError:
-                        pass
+                _metrics_subscribers.discard(queue)
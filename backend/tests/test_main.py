@@ -3,70 +3,113 @@
 These tests validate endpoint behavior without requiring a live Redis instance.
 """
 
+import asyncio
 import json
 from collections import defaultdict, deque
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
+import pytest
 from fastapi.testclient import TestClient
-from redis.exceptions import RedisError
+from redis.exceptions import NoScriptError, RedisError
 
 from backend.app import main as backend_main
 
 
-class FakePipeline:
-    """Minimal Redis pipeline stub used by ingest tests."""
+class FakeRedisIngest:
+    """Redis stub exposing ping and the timeline script used by health, ingest, and alert tests.
+
+    Each script call is recorded as (command, sha_or_script, rate_key, rate_limit, appends), with
+    one (key, channel, score, member, min_score, ttl) tuple per timeline append. The per-minute
+    counter the script gates on is emulated, and queued ``script_errors`` are raised by the next
+    script calls instead of running them.
+    """
+
+    def __init__(self, script_cached=True):
+        self.script_calls = []
+        self.script_errors = []
+        self.script_cached = script_cached
+        self.rate_counters = defaultdict(int)
+        self.pipeline_executions = []
+
+    async def ping(self):
+        return True
 
-    def __init__(self):
-        self.zadd_payload = None
-        self.zremrangebyscore_args = None
-        self.publish_args = None
-        self.expire_args = None
-        self.executed = False
-
-    def zadd(self, key, mapping):
-        self.zadd_payload = (key, mapping)
-        return self
+    async def evalsha(self, sha, numkeys, *keys_and_args):
+        if not self.script_cached:
+            raise NoScriptError("No matching script")
+        return self._run_script("evalsha", sha, numkeys, keys_and_args)
 
-    def zremrangebyscore(self, key, min_score, max_score):
-        self.zremrangebyscore_args = (key, min_score, max_score)
-        return self
+    async def eval(self, script, numkeys, *keys_and_args):
+        self.script_cached = True
+        return self._run_script("eval", script, numkeys, keys_and_args)
 
-    def expire(self, key, ttl):
-        self.expire_args = (key, ttl)
-        return self
+    def _run_script(self, command, sha_or_script, numkeys, keys_and_args):
+        if self.script_errors:
+            raise self.script_errors.pop(0)
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        appends = [
+            (keys[1 + 2 * index], keys[2 + 2 * index], *args[1 + 4 * index:5 + 4 * index])
+            for index in range((numkeys - 1) // 2)
+        ]
+        self.script_calls.append((command, sha_or_script, keys[0], args[0], appends))
 
-    def publish(self, channel, message):
-        self.publish_args = (channel, message)
-        return self
+        if args[0] != "":
+            self.rate_counters[keys[0]] += 1
+            if self.rate_counters[keys[0]] > int(args[0]):
+                return 0
+        return 1
 
-    def execute(self):
-        self.executed = True
-        return [1, 0, 1]
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
 
 
-class FakeRedisIngest:
-    """Redis stub exposing ping/pipeline methods used by ingest and health tests."""
+class FakeRedisPipeline:
+    """Queues script calls and replies to all of them on execute, like a non-transactional pipeline."""
 
-    def __init__(self):
-        self.pipeline_instances = []
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
 
-    def ping(self):
-        return True
+    def evalsha(self, sha, numkeys, *keys_and_args):
+        self.commands.append((self.redis.evalsha, sha, numkeys, keys_and_args))
 
-    def pipeline(self):
-        pipeline = FakePipeline()
-        self.pipeline_instances.append(pipeline)
-        return pipeline
+    def eval(self, script, numkeys, *keys_and_args):
+        self.commands.append((self.redis.eval, script, numkeys, keys_and_args))
+
+    async def execute(self, raise_on_error=True):
+        self.redis.pipeline_executions.append(len(self.commands))
+        results = []
+        for method, sha_or_script, numkeys, keys_and_args in self.commands:
+            try:
+                results.append(await method(sha_or_script, numkeys, *keys_and_args))
+            except NoScriptError as ex:
+                results.append(ex)
+        return results
 
 
 class FakeRedisRecent:
-    """Redis stub exposing zrangebyscore for recent metrics retrieval tests."""
+    """Redis stub exposing zrangebyscore (with optional LIMIT paging) for recent-data tests.
+
+    Items are returned as bytes, matching the backend clients' decode_responses=False.
+    """
 
     def __init__(self, items):
-        self.items = items
+        self.items = [item.encode("utf-8") if isinstance(item, str) else item for item in items]
 
-    def zrangebyscore(self, key, minimum, maximum):
-        return self.items
+    async def zrangebyscore(self, key, minimum, maximum, start=None, num=None, withscores=False):
+        items = self.items if start is None or num is None else self.items[start:start + num]
+        if withscores:
+            return [(item, self._score(item)) for item in items]
+        return items
+
+    @staticmethod
+    def _score(item):
+        # Malformed members still need a score; any value works since the bounds are ignored.
+        try:
+            return float(json.loads(item)["timestamp"])
+        except (ValueError, KeyError, TypeError):
+            return 0.0
 
 
 class FakeRedisRecentSpy(FakeRedisRecent):
@@ -75,10 +118,42 @@ class FakeRedisRecentSpy(FakeRedisRecent):
     def __init__(self, items):
         super().__init__(items)
         self.last_call = None
+        self.calls = []
 
-    def zrangebyscore(self, key, minimum, maximum):
+    async def zrangebyscore(self, key, minimum, maximum, start=None, num=None, withscores=False):
         self.last_call = (key, minimum, maximum)
-        return self.items
+        self.calls.append((start, num))
+        return await super().zrangebyscore(key, minimum, maximum, start, num, withscores)
+
+
+class FakeRedisTimeline:
+    """Redis stub for a scored sorted set whose zrangebyscore honors the minimum score and LIMIT.
+
+    Members are ordered by score, then by member bytes, as Redis orders them.
+    """
+
+    def __init__(self, entries):
+        self.entries = sorted(
+            ((member.encode("utf-8"), float(score)) for member, score in entries),
+            key=lambda entry: (entry[1], entry[0]),
+        )
+        self.calls = []
+
+    async def zrangebyscore(self, key, minimum, maximum, start=None, num=None, withscores=False):
+        self.calls.append((minimum, start, num))
+        matching = [entry for entry in self.entries if entry[1] >= float(minimum)]
+        if start is not None and num is not None:
+            matching = matching[start:start + num]
+        if withscores:
+            return matching
+        return [member for member, _ in matching]
+
+
+@pytest.fixture(autouse=True)
+def reset_recent_metrics_cache(monkeypatch):
+    """Give every test an empty recent-metrics microcache."""
+
+    monkeypatch.setattr(backend_main, "_recent_metrics_cache", {})
 
 
 def sample_payload(ts: int | None = None):
@@ -103,7 +178,7 @@ def test_health_ok(monkeypatch):
     """Returns healthy response when Redis ping succeeds."""
 
     fake_redis = FakeRedisIngest()
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
 
     client = TestClient(backend_main.app)
     response = client.get("/health")
@@ -122,7 +197,7 @@ def test_health_degraded_when_redis_down(monkeypatch):
     def _raise():
         raise RedisError("connection failed")
 
-    monkeypatch.setattr(backend_main, "get_redis", _raise)
+    monkeypatch.setattr(backend_main, "get_async_redis", _raise)
 
     client = TestClient(backend_main.app)
     response = client.get("/health")
@@ -139,7 +214,9 @@ def test_ingest_metrics_success(monkeypatch):
     """Stores incoming metrics in Redis sorted set and returns accepted."""
 
     fake_redis = FakeRedisIngest()
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "_last_metrics_prune_epoch", 0)
+    monkeypatch.setattr(backend_main, "_last_metrics_expire_epoch", 0)
 
     payload = sample_payload()
     client = TestClient(backend_main.app)
@@ -148,29 +225,99 @@ def test_ingest_metrics_success(monkeypatch):
     assert response.status_code == 200
     assert response.json() == {"status": "accepted", "timestamp": payload["timestamp"]}
 
-    pipeline = fake_redis.pipeline_instances[0]
-    assert pipeline.executed is True
-    assert pipeline.zadd_payload is not None
-    assert pipeline.zremrangebyscore_args is not None
-    assert pipeline.expire_args is not None
-    assert pipeline.zadd_payload[0] == backend_main.METRICS_KEY
-    assert pipeline.zremrangebyscore_args[0] == backend_main.METRICS_KEY
-    assert pipeline.zremrangebyscore_args[1] == "-inf"
-    assert pipeline.publish_args is not None
-    assert pipeline.publish_args[0] == backend_main.METRICS_CHANNEL
-    assert pipeline.expire_args == (backend_main.METRICS_KEY, backend_main.RETENTION_SECONDS * 2)
-
-    stored_json = next(iter(pipeline.zadd_payload[1].keys()))
+    assert len(fake_redis.script_calls) == 1
+    command, sha, rate_key, rate_limit, appends = fake_redis.script_calls[0]
+    assert command == "evalsha"
+    assert sha == backend_main._TIMELINE_APPEND_SHA
+    assert rate_key.startswith(f"{backend_main.RATE_LIMIT_KEY_PREFIX}:testclient:")
+    assert rate_limit == backend_main.AGENT_RATE_LIMIT_PER_MINUTE
+    assert len(appends) == 1
+
+    key, channel, score, stored_json, min_score, ttl = appends[0]
+    assert key == backend_main.METRICS_KEY
+    assert channel == backend_main.METRICS_CHANNEL
+    assert score == payload["timestamp"]
+    assert isinstance(min_score, int)
+    assert ttl == backend_main.RETENTION_SECONDS * 2
     assert json.loads(stored_json)["timestamp"] == payload["timestamp"]
 
 
+def test_ingest_metrics_skips_prune_and_expire_within_interval(monkeypatch):
+    """Only prunes and refreshes the timeline TTL once per configured interval."""
+
+    fake_redis = FakeRedisIngest()
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 0)
+    monkeypatch.setattr(backend_main, "_last_metrics_prune_epoch", 0)
+    monkeypatch.setattr(backend_main, "_last_metrics_expire_epoch", 0)
+
+    client = TestClient(backend_main.app)
+    first = client.post("/ingest/metrics", json=sample_payload())
+    # Pretend the first ingest just happened so the second falls inside both intervals.
+    monkeypatch.setattr(backend_main, "_last_metrics_prune_epoch", int(datetime.now(timezone.utc).timestamp()))
+    second = client.post("/ingest/metrics", json=sample_payload())
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+
+    first_append = fake_redis.script_calls[0][4][0]
+    second_append = fake_redis.script_calls[1][4][0]
+    assert fake_redis.script_calls[0][3] == ""
+    assert first_append[4] != "" and first_append[5] != ""
+    assert second_append[4] == "" and second_append[5] == ""
+
+
+def test_ingest_metrics_reloads_script_after_noscript(monkeypatch):
+    """Falls back to EVAL when the timeline script is missing from the Redis script cache."""
+
+    fake_redis = FakeRedisIngest(script_cached=False)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+
+    client = TestClient(backend_main.app)
+    response = client.post("/ingest/metrics", json=sample_payload())
+
+    assert response.status_code == 200
+    assert [call[0] for call in fake_redis.script_calls] == ["eval"]
+    assert fake_redis.script_calls[0][1] == backend_main._TIMELINE_APPEND_LUA
+
+
+def test_ingest_batcher_shares_one_pipeline_across_concurrent_ingests(monkeypatch):
+    """Coalesces concurrent timeline script calls into a single pipeline execution."""
+
+    fake_redis = FakeRedisIngest(script_cached=False)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+
+    async def _run():
+        await backend_main.start_ingest_batcher()
+        try:
+            writes = [
+                backend_main._timeline_write("metrics", "live", ts, b"{}", None, None)
+                for ts in range(3)
+            ]
+            return await asyncio.gather(
+                *(
+                    backend_main._append_to_timelines(f"rate:{index}", 1, [write])
+                    for index, write in enumerate(writes)
+                ),
+                backend_main._append_to_timelines("rate:0", 1, [writes[0]]),
+            )
+        finally:
+            await backend_main.stop_ingest_batcher()
+
+    assert asyncio.run(_run()) == [True, True, True, False]
+    # One pipeline hit NOSCRIPT for every call; the retry reloads the script on a second one.
+    assert fake_redis.pipeline_executions == [4, 4]
+    assert [call[0] for call in fake_redis.script_calls] == ["eval"] * 4
+    assert backend_main._ingest_batch_queue is None
+
+
 def test_ingest_metrics_redis_error(monkeypatch):
     """Returns 503 when ingest path cannot reach Redis."""
 
     def _raise():
         raise RedisError("redis unavailable")
 
-    monkeypatch.setattr(backend_main, "get_redis", _raise)
+    monkeypatch.setattr(backend_main, "get_async_redis", _raise)
 
     client = TestClient(backend_main.app)
     response = client.post("/ingest/metrics", json=sample_payload())
@@ -188,7 +335,7 @@ def test_get_recent_metrics_returns_valid_and_skips_invalid(monkeypatch):
         "not-json",
     ]
 
-    monkeypatch.setattr(backend_main, "get_redis", lambda: FakeRedisRecent(fake_items))
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent(fake_items))
 
     client = TestClient(backend_main.app)
     response = client.get("/api/metrics/recent")
@@ -199,13 +346,159 @@ def test_get_recent_metrics_returns_valid_and_skips_invalid(monkeypatch):
     assert body[0]["timestamp"] == valid_payload["timestamp"]
 
 
+def test_get_recent_metrics_returns_stored_json_verbatim(monkeypatch):
+    """Emits valid stored entries as a JSON array without re-serializing them."""
+
+    stored = [json.dumps(sample_payload(1_700_000_000)), json.dumps(sample_payload(1_700_000_002))]
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent(stored + ["{}"]))
+
+    client = TestClient(backend_main.app)
+    response = client.get("/api/metrics/recent")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.text == "[" + ",".join(stored) + "]"
+
+
+def test_get_recent_metrics_serves_repeat_reads_from_cache(monkeypatch):
+    """Reuses the serialized response for reads within the same window and TTL."""
+
+    calls = []
+
+    class CountingRedis(FakeRedisRecent):
+        def zrangebyscore(self, key, minimum, maximum, start=None, num=None, withscores=False):
+            calls.append(minimum)
+            return super().zrangebyscore(key, minimum, maximum, start, num, withscores)
+
+    fake_redis = CountingRedis([json.dumps(sample_payload())])
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "_RECENT_METRICS_CACHE_TTL_SECONDS", 60.0)
+
+    client = TestClient(backend_main.app)
+    first = client.get("/api/metrics/recent")
+    second = client.get("/api/metrics/recent")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    # A second Redis read only happens if the wall clock crossed a second boundary.
+    assert len(calls) == len(set(calls))
+
+
+def test_get_recent_metrics_streams_large_windows_in_pages(monkeypatch):
+    """Streams windows larger than one page by score and skips invalid entries."""
+
+    now = int(datetime.now(timezone.utc).timestamp())
+    entries = [(json.dumps(sample_payload(now - 10 + offset)), now - 10 + offset) for offset in range(5)]
+    entries.insert(2, ("not-json", now - 9))
+    fake_redis = FakeRedisTimeline(entries)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "_RECENT_METRICS_PAGE_SIZE", 2)
+
+    client = TestClient(backend_main.app)
+    response = client.get("/api/metrics/recent")
+
+    assert response.status_code == 200
+    assert [item["timestamp"] for item in response.json()] == [now - 10 + offset for offset in range(5)]
+    # Each page resumes at the last score it returned and over-fetches by the members already sent there.
+    assert fake_redis.calls[1:] == [(now - 9, 0, 3), (now - 8, 0, 3), (now - 6, 0, 3)]
+    assert backend_main._recent_metrics_cache == {}
+
+
+def test_get_recent_metrics_stream_survives_concurrent_prune(monkeypatch):
+    """Keeps every entry when the head of the window is pruned between stream pages."""
+
+    now = int(datetime.now(timezone.utc).timestamp())
+    entries = [(json.dumps(sample_payload(now - 10 + offset)), now - 10 + offset) for offset in range(6)]
+    fake_redis = FakeRedisTimeline(entries)
+    original = fake_redis.zrangebyscore
+
+    async def zrangebyscore_with_prune(*args, **kwargs):
+        page = await original(*args, **kwargs)
+        # Ingest prunes the two oldest entries right after the first page was read.
+        if len(fake_redis.calls) == 1:
+            fake_redis.entries = fake_redis.entries[2:]
+        return page
+
+    monkeypatch.setattr(fake_redis, "zrangebyscore", zrangebyscore_with_prune)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "_RECENT_METRICS_PAGE_SIZE", 2)
+
+    client = TestClient(backend_main.app)
+    response = client.get("/api/metrics/recent")
+
+    assert response.status_code == 200
+    assert [item["timestamp"] for item in response.json()] == [now - 10 + offset for offset in range(6)]
+
+
+def test_get_recent_metrics_pages_with_cursor(monkeypatch):
+    """Returns one bounded page from the cursor on and hands back the cursor for the next one."""
+
+    now = int(datetime.now(timezone.utc).timestamp())
+    stored = [json.dumps(sample_payload(now - 10 + offset)) for offset in range(3)]
+    fake_redis = FakeRedisRecentSpy(stored)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+
+    client = TestClient(backend_main.app)
+    full = client.get("/api/metrics/recent", params={"limit": 3, "cursor_ts": now - 10})
+    partial = client.get("/api/metrics/recent", params={"limit": 5, "cursor_ts": 1})
+
+    assert full.status_code == 200
+    assert [item["timestamp"] for item in full.json()] == [now - 10, now - 9, now - 8]
+    assert full.headers["X-Next-Cursor"] == f"{now - 8}:1"
+    assert fake_redis.calls == [(0, 3), (0, 5)]
+    # Cursors older than the retention window are clamped to it, and a short page ends paging.
+    assert fake_redis.last_call[1] >= now - backend_main.RETENTION_SECONDS
+    assert "X-Next-Cursor" not in partial.headers
+    assert backend_main._recent_metrics_cache == {}
+
+
+def test_get_recent_metrics_cursor_resumes_within_a_shared_timestamp(monkeypatch):
+    """Returns every snapshot once when agents share a timestamp across a page boundary."""
+
+    now = int(datetime.now(timezone.utc).timestamp())
+    agents_per_second = ((now - 10, 3), (now - 9, 2), (now - 8, 1))
+    expected = [(ts, float(agent)) for ts, agents in agents_per_second for agent in range(agents)]
+    entries = []
+    for ts, cpu in expected:
+        payload = sample_payload(ts)
+        payload["total_cpu_percent"] = cpu
+        entries.append((json.dumps(payload), ts))
+    fake_redis = FakeRedisTimeline(entries)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+
+    client = TestClient(backend_main.app)
+    collected = []
+    cursors = []
+    params = {"limit": 2, "cursor_ts": now - 10}
+    while True:
+        response = client.get("/api/metrics/recent", params=params)
+        assert response.status_code == 200
+        collected.extend((item["timestamp"], item["total_cpu_percent"]) for item in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        cursors.append(response.headers["X-Next-Cursor"])
+        params = {"limit": 2, "cursor": response.headers["X-Next-Cursor"]}
+
+    assert collected == expected
+    assert cursors == [f"{now - 10}:2", f"{now - 9}:1", f"{now - 8}:1"]
+
+
+def test_get_recent_metrics_rejects_malformed_cursor():
+    """Returns 422 for cursors that are not score:skip pairs."""
+
+    client = TestClient(backend_main.app)
+    response = client.get("/api/metrics/recent", params={"cursor": "123"})
+
+    assert response.status_code == 422
+
+
 def test_get_recent_metrics_redis_error(monkeypatch):
     """Returns 503 when recent-metrics query cannot reach Redis."""
 
     def _raise():
         raise RedisError("redis unavailable")
 
-    monkeypatch.setattr(backend_main, "get_redis", _raise)
+    monkeypatch.setattr(backend_main, "get_async_redis", _raise)
 
     client = TestClient(backend_main.app)
     response = client.get("/api/metrics/recent")
@@ -217,7 +510,7 @@ def test_get_recent_metrics_redis_error(monkeypatch):
 def test_get_recent_metrics_empty_result(monkeypatch):
     """Returns an empty list when no records are present in Redis."""
 
-    monkeypatch.setattr(backend_main, "get_redis", lambda: FakeRedisRecent([]))
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent([]))
 
     client = TestClient(backend_main.app)
     response = client.get("/api/metrics/recent")
@@ -238,7 +531,7 @@ def test_get_recent_metrics_skips_schema_invalid_json(monkeypatch):
     )
 
     fake_items = [missing_timestamp, json.dumps(valid_payload)]
-    monkeypatch.setattr(backend_main, "get_redis", lambda: FakeRedisRecent(fake_items))
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent(fake_items))
 
     client = TestClient(backend_main.app)
     response = client.get("/api/metrics/recent")
@@ -253,7 +546,7 @@ def test_get_recent_metrics_uses_expected_score_bounds(monkeypatch):
     """Queries Redis using configured key and inclusive recent-window bounds."""
 
     fake_redis = FakeRedisRecentSpy([])
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
 
     client = TestClient(backend_main.app)
     response = client.get("/api/metrics/recent")
@@ -313,9 +606,8 @@ def test_ingest_requires_agent_token_when_configured(monkeypatch):
     """Returns 401 when AGENT_API_TOKEN is configured and header is missing/invalid."""
 
     fake_redis = FakeRedisIngest()
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
     monkeypatch.setattr(backend_main, "AGENT_API_TOKEN", "secret-token")
-    monkeypatch.setattr(backend_main, "_agent_rate_windows", defaultdict(deque))
 
     client = TestClient(backend_main.app)
     response = client.post("/ingest/metrics", json=sample_payload())
@@ -333,10 +625,9 @@ def test_ingest_applies_rate_limit(monkeypatch):
     """Returns 429 when agent requests exceed configured per-minute budget."""
 
     fake_redis = FakeRedisIngest()
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
     monkeypatch.setattr(backend_main, "AGENT_API_TOKEN", "")
     monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 1)
-    monkeypatch.setattr(backend_main, "_agent_rate_windows", defaultdict(deque))
 
     client = TestClient(backend_main.app)
     first = client.post("/ingest/metrics", json=sample_payload())
@@ -350,24 +641,111 @@ def test_ingest_triggers_alert_notification(monkeypatch):
     """Publishes an alert notification when CPU threshold-duration rule is met."""
 
     fake_redis = FakeRedisIngest()
-    monkeypatch.setattr(backend_main, "get_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
     monkeypatch.setattr(backend_main, "AGENT_API_TOKEN", "")
     monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 120)
-    monkeypatch.setattr(backend_main, "_agent_rate_windows", defaultdict(deque))
     monkeypatch.setattr(backend_main, "ALERT_CPU_THRESHOLD", 10.0)
     monkeypatch.setattr(backend_main, "ALERT_CPU_DURATION_SECONDS", 0)
     monkeypatch.setattr(backend_main, "_high_cpu_window_start_ts", None)
     monkeypatch.setattr(backend_main, "_high_cpu_alert_active", False)
 
-    published = []
-    monkeypatch.setattr(backend_main, "publish_alert", lambda alert: published.append(alert))
+    client = TestClient(backend_main.app)
+    response = client.post("/ingest/metrics", json=sample_payload())
+
+    assert response.status_code == 200
+    assert len(fake_redis.script_calls) == 2
+    assert [append[0] for append in fake_redis.script_calls[0][4]] == [backend_main.METRICS_KEY]
+
+    # The alert is written once the snapshot is stored, outside the rate-limit gate.
+    _, _, _, rate_limit, appends = fake_redis.script_calls[1]
+    assert rate_limit == ""
+    assert [append[0] for append in appends] == [backend_main.ALERTS_KEY]
+    key, channel, score, serialized, _, ttl = appends[0]
+    assert channel == backend_main.ALERTS_CHANNEL
+    assert ttl == backend_main.ALERT_RETENTION_SECONDS * 2
+    assert json.loads(serialized)["rule"] == "cpu_threshold_duration"
+    assert score == json.loads(serialized)["timestamp"]
+    assert backend_main.AlertEvent.model_validate_json(serialized).current_value == sample_payload()["total_cpu_percent"]
+
+
+def _enable_immediate_cpu_alert(monkeypatch):
+    monkeypatch.setattr(backend_main, "AGENT_API_TOKEN", "")
+    monkeypatch.setattr(backend_main, "ALERT_CPU_THRESHOLD", 10.0)
+    monkeypatch.setattr(backend_main, "ALERT_CPU_DURATION_SECONDS", 0)
+    monkeypatch.setattr(backend_main, "_high_cpu_window_start_ts", None)
+    monkeypatch.setattr(backend_main, "_high_cpu_alert_active", False)
+
+
+def _alert_appends(fake_redis):
+    return [append for call in fake_redis.script_calls for append in call[4] if append[0] == backend_main.ALERTS_KEY]
+
+
+def test_rate_limited_ingest_does_not_advance_alert_rule(monkeypatch):
+    """Leaves the alert rule untouched for a rejected snapshot so the next accepted one raises it."""
+
+    fake_redis = FakeRedisIngest()
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 1)
+    _enable_immediate_cpu_alert(monkeypatch)
+
+    # Use up this minute's budget so the alerting request is rejected.
+    fake_redis.rate_counters[backend_main._rate_limit_key("testclient", int(datetime.now(timezone.utc).timestamp()))] = 1
+
+    client = TestClient(backend_main.app)
+    response = client.post("/ingest/metrics", json=sample_payload())
+
+    assert response.status_code == 429
+    assert backend_main._high_cpu_window_start_ts is None
+    assert backend_main._high_cpu_alert_active is False
+    assert _alert_appends(fake_redis) == []
+
+
+def test_alert_fires_on_success_after_redis_error(monkeypatch):
+    """Raises the alert on the first stored snapshot after an ingest failed with a Redis error."""
+
+    fake_redis = FakeRedisIngest()
+    fake_redis.script_errors.append(RedisError("connection reset"))
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 120)
+    _enable_immediate_cpu_alert(monkeypatch)
+
+    client = TestClient(backend_main.app)
+    failed = client.post("/ingest/metrics", json=sample_payload())
+
+    assert failed.status_code == 503
+    assert backend_main._high_cpu_window_start_ts is None
+    assert backend_main._high_cpu_alert_active is False
+
+    succeeded = client.post("/ingest/metrics", json=sample_payload())
+
+    assert succeeded.status_code == 200
+    assert len(_alert_appends(fake_redis)) == 1
+    assert backend_main._high_cpu_alert_active is True
+
+
+def test_alert_rearms_when_alert_write_fails(monkeypatch):
+    """Keeps the snapshot accepted and re-arms the rule when only the alert write fails."""
+
+    fake_redis = FakeRedisIngest()
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "AGENT_RATE_LIMIT_PER_MINUTE", 120)
+    _enable_immediate_cpu_alert(monkeypatch)
+
+    original = fake_redis._run_script
+
+    def _run_script(command, sha_or_script, numkeys, keys_and_args):
+        if backend_main.ALERTS_KEY in keys_and_args[:numkeys]:
+            raise RedisError("connection reset")
+        return original(command, sha_or_script, numkeys, keys_and_args)
+
+    monkeypatch.setattr(fake_redis, "_run_script", _run_script)
 
     client = TestClient(backend_main.app)
     response = client.post("/ingest/metrics", json=sample_payload())
 
     assert response.status_code == 200
-    assert len(published) == 1
-    assert published[0].rule == "cpu_threshold_duration"
+    assert _alert_appends(fake_redis) == []
+    assert backend_main._high_cpu_alert_active is False
 
 
 def test_get_recent_alerts(monkeypatch):
@@ -382,7 +760,7 @@ def test_get_recent_alerts(monkeypatch):
         "threshold": 90.0,
     }
 
-    monkeypatch.setattr(backend_main, "get_redis", lambda: FakeRedisRecent([json.dumps(alert)]))
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent([json.dumps(alert)]))
 
     client = TestClient(backend_main.app)
     response = client.get("/api/alerts/recent")
@@ -390,3 +768,329 @@ def test_get_recent_alerts(monkeypatch):
     assert response.status_code == 200
     assert len(response.json()) == 1
     assert response.json()[0]["rule"] == "cpu_threshold_duration"
+
+
+def test_get_recent_alerts_skips_malformed_and_incomplete(monkeypatch):
+    """Skips alert records that are not JSON objects or are missing fields."""
+
+    alert = {
+        "timestamp": int(datetime.now(timezone.utc).timestamp()),
+        "rule": "cpu_threshold_duration",
+        "severity": "warning",
+        "message": "CPU high",
+        "current_value": 95.0,
+        "threshold": 90.0,
+    }
+    incomplete = {key: value for key, value in alert.items() if key != "threshold"}
+
+    fake_items = ["not-json", json.dumps([1, 2]), json.dumps(incomplete), json.dumps(alert)]
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisRecent(fake_items))
+
+    client = TestClient(backend_main.app)
+    response = client.get("/api/alerts/recent")
+
+    assert response.status_code == 200
+    assert response.json() == [alert]
+
+
+class FakeCopy:
+    """psycopg COPY context stub that records written rows."""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        self.sink.append(row)
+
+
+class FakePostgresPool:
+    """psycopg_pool stub whose connections record COPY statements and rows."""
+
+    def __init__(self):
+        self.copies = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def copy(self, statement):
+        rows = []
+        self.copies.append((statement, rows))
+        return FakeCopy(rows)
+
+
+def test_postgres_rows_are_buffered_and_flushed_in_batches(monkeypatch):
+    """Queues snapshot rows on ingest and writes them with COPY in bounded batches."""
+
+    fake_pool = FakePostgresPool()
+    monkeypatch.setattr(backend_main, "POSTGRES_DSN", "postgresql://example")
+    monkeypatch.setattr(backend_main, "_POSTGRES_FLUSH_BATCH_SIZE", 2)
+    monkeypatch.setattr(backend_main, "_postgres_buffer", deque())
+    monkeypatch.setattr(backend_main, "_get_postgres_pool", lambda: fake_pool)
+    monkeypatch.setattr(backend_main, "_PSYCOPG_OK", True)
+    monkeypatch.setattr(backend_main, "_JSONB", lambda value: ("jsonb", value))
+    wakeup = asyncio.Event()
+    monkeypatch.setattr(backend_main, "_postgres_flush_wakeup", wakeup)
+
+    payloads = [
+        backend_main.MetricsPayload.model_validate(sample_payload(1_700_000_000 + offset))
+        for offset in range(3)
+    ]
+    backend_main.store_metrics_in_postgres(payloads[0], payloads[0].model_dump())
+    assert not wakeup.is_set()
+
+    for payload in payloads[1:]:
+        backend_main.store_metrics_in_postgres(payload, payload.model_dump())
+
+    assert wakeup.is_set()
+    assert len(backend_main._postgres_buffer) == 3
+    assert fake_pool.copies == []
+
+    backend_main.flush_postgres_buffer()
+
+    assert len(backend_main._postgres_buffer) == 0
+    assert [len(rows) for _, rows in fake_pool.copies] == [2, 1]
+    assert "COPY metrics_snapshots" in fake_pool.copies[0][0]
+    assert fake_pool.copies[1][1][0][1] == 1_700_000_002
+    # Per-core values go to a DOUBLE PRECISION[] column as a plain list; processes stay JSONB.
+    assert fake_pool.copies[1][1][0][3] == list(payloads[2].per_core_cpu_percent)
+    assert fake_pool.copies[1][1][0][6][0] == "jsonb"
+
+
+class FakeSchemaConnection:
+    """psycopg connection stub for schema setup that reports a fixed per-core column type."""
+
+    def __init__(self, per_core_type):
+        self.per_core_type = per_core_type
+        self.statements = []
+        self.transactions = 0
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield
+
+    def execute(self, statement, params=None):
+        self.statements.append(" ".join(statement.split()))
+
+    def fetchone(self):
+        return (self.per_core_type,)
+
+
+def _alter_statements(connection):
+    return [statement for statement in connection.statements if statement.startswith("ALTER TABLE")]
+
+
+def test_postgres_schema_keeps_legacy_jsonb_per_core_column_without_migration_flag(monkeypatch):
+    """Leaves a JSONB per-core column alone by default and writes that column as JSONB."""
+
+    monkeypatch.setattr(backend_main, "_postgres_schema_ready", False)
+    monkeypatch.setattr(backend_main, "_postgres_per_core_jsonb", False)
+    monkeypatch.setattr(backend_main, "POSTGRES_MIGRATE_PER_CORE_ARRAY", False)
+    connection = FakeSchemaConnection("jsonb")
+
+    backend_main._ensure_postgres_schema(connection)
+
+    assert _alter_statements(connection) == []
+    assert backend_main._postgres_per_core_jsonb is True
+
+    fake_pool = FakePostgresPool()
+    monkeypatch.setattr(backend_main, "_get_postgres_pool", lambda: fake_pool)
+    monkeypatch.setattr(backend_main, "_JSONB", lambda value: ("jsonb", value))
+    monkeypatch.setattr(backend_main, "_postgres_buffer", deque([("ts", 1, 5.0, [1.5, 2.0], 0.0, 0.0, ("jsonb", []))]))
+
+    backend_main.flush_postgres_buffer()
+
+    assert fake_pool.copies[0][1][0][3] == ("jsonb", [1.5, 2.0])
+
+
+def test_postgres_schema_migrates_legacy_per_core_column_when_enabled(monkeypatch):
+    """Converts a JSONB per-core column to a float array in one transaction when opted in."""
+
+    monkeypatch.setattr(backend_main, "_postgres_schema_ready", False)
+    monkeypatch.setattr(backend_main, "_postgres_per_core_jsonb", True)
+    monkeypatch.setattr(backend_main, "POSTGRES_MIGRATE_PER_CORE_ARRAY", True)
+    connection = FakeSchemaConnection("jsonb")
+
+    backend_main._ensure_postgres_schema(connection)
+
+    altered = _alter_statements(connection)
+    assert len(altered) == 3
+    assert "TYPE DOUBLE PRECISION[] USING translate(per_core_cpu_percent::text, '[]', '{}')" in altered[1]
+    assert connection.transactions == 1
+    assert backend_main._postgres_per_core_jsonb is False
+
+
+def test_postgres_schema_skips_migration_for_array_column(monkeypatch):
+    """Runs no ALTER for tables that already store per-core values as an array."""
+
+    monkeypatch.setattr(backend_main, "_postgres_schema_ready", False)
+    monkeypatch.setattr(backend_main, "POSTGRES_MIGRATE_PER_CORE_ARRAY", True)
+    connection = FakeSchemaConnection("ARRAY")
+
+    backend_main._ensure_postgres_schema(connection)
+
+    assert _alter_statements(connection) == []
+    assert backend_main._postgres_per_core_jsonb is False
+
+
+def test_full_postgres_buffer_counts_and_logs_dropped_rows(monkeypatch, caplog):
+    """Drops the oldest row once the buffer is full and reports the drop count once."""
+
+    monkeypatch.setattr(backend_main, "POSTGRES_DSN", "postgresql://example")
+    monkeypatch.setattr(backend_main, "_POSTGRES_BUFFER_MAX_ROWS", 2)
+    monkeypatch.setattr(backend_main, "_postgres_buffer", deque(maxlen=2))
+    monkeypatch.setattr(backend_main, "_postgres_dropped_rows", 0)
+    monkeypatch.setattr(backend_main, "_postgres_flush_wakeup", None)
+    monkeypatch.setattr(backend_main, "_PSYCOPG_OK", True)
+    monkeypatch.setattr(backend_main, "_JSONB", lambda value: ("jsonb", value))
+
+    for offset in range(3):
+        payload = backend_main.MetricsPayload.model_validate(sample_payload(1_700_000_000 + offset))
+        backend_main.store_metrics_in_postgres(payload, payload.model_dump())
+
+    assert [row[1] for row in backend_main._postgres_buffer] == [1_700_000_001, 1_700_000_002]
+    assert backend_main._postgres_dropped_rows == 1
+
+    with caplog.at_level("WARNING", logger=backend_main.logger.name):
+        backend_main._log_dropped_postgres_rows()
+        backend_main._log_dropped_postgres_rows()
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "PostgreSQL buffer full (2 rows); dropped 1 snapshot rows"
+    ]
+    assert backend_main._postgres_dropped_rows == 0
+
+
+def test_broadcast_fans_out_and_drops_oldest_for_full_queues(monkeypatch):
+    """Delivers each frame to every subscriber queue and sheds the oldest frame when one is full."""
+
+    fast = asyncio.Queue(maxsize=4)
+    slow = asyncio.Queue(maxsize=1)
+    monkeypatch.setattr(backend_main, "_metrics_subscribers", {fast, slow})
+
+    backend_main._broadcast_metrics_frame(b"first")
+    backend_main._broadcast_metrics_frame(b"second")
+
+    assert [fast.get_nowait(), fast.get_nowait()] == [b"first", b"second"]
+    assert slow.get_nowait() == b"second"
+
+
+def test_broadcast_loop_forwards_published_bytes(monkeypatch):
+    """Relays message payloads from the shared subscription as-is and skips empty polls."""
+
+    class FakePubSub:
+        def __init__(self):
+            self.replies = [None, {"type": "message", "data": b'{"timestamp": 1}'}]
+            self.closed = False
+
+        async def subscribe(self, channel):
+            self.channel = channel
+
+        async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+            assert ignore_subscribe_messages and timeout is None
+            if not self.replies:
+                raise asyncio.CancelledError
+            return self.replies.pop(0)
+
+        async def aclose(self):
+            self.closed = True
+
+    class FakeRedisPubSub:
+        def __init__(self):
+            self.pubsub_client = FakePubSub()
+
+        def pubsub(self, ignore_subscribe_messages=False):
+            return self.pubsub_client
+
+    fake_redis = FakeRedisPubSub()
+    subscriber = asyncio.Queue(maxsize=4)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: fake_redis)
+    monkeypatch.setattr(backend_main, "_metrics_subscribers", {subscriber})
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(backend_main._metrics_broadcast_loop())
+
+    assert subscriber.get_nowait() == b'{"timestamp": 1}'
+    assert subscriber.empty()
+    assert fake_redis.pubsub_client.channel == backend_main.METRICS_CHANNEL
+    assert fake_redis.pubsub_client.closed
+
+
+def test_broadcast_loop_resubscribes_after_unexpected_error(monkeypatch, caplog):
+    """Logs a non-Redis failure and keeps relaying from a fresh subscription."""
+
+    class FakePubSub:
+        def __init__(self, replies):
+            self.replies = replies
+            self.closed = False
+
+        async def subscribe(self, channel):
+            pass
+
+        async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+            if not self.replies:
+                raise asyncio.CancelledError
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        async def aclose(self):
+            self.closed = True
+
+    subscriptions = [
+        FakePubSub([ValueError("bad message")]),
+        FakePubSub([{"type": "message", "data": b'{"timestamp": 2}'}]),
+    ]
+    created = []
+
+    class FakeRedisPubSub:
+        def pubsub(self, ignore_subscribe_messages=False):
+            created.append(subscriptions.pop(0))
+            return created[-1]
+
+    subscriber = asyncio.Queue(maxsize=4)
+    monkeypatch.setattr(backend_main, "get_async_redis", lambda: FakeRedisPubSub())
+    monkeypatch.setattr(backend_main, "_metrics_subscribers", {subscriber})
+    monkeypatch.setattr(backend_main, "_METRICS_BROADCAST_RETRY_SECONDS", 0)
+
+    with caplog.at_level("ERROR", logger=backend_main.logger.name):
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(backend_main._metrics_broadcast_loop())
+
+    assert subscriber.get_nowait() == b'{"timestamp": 2}'
+    assert all(pubsub.closed for pubsub in created) and len(created) == 2
+    assert "Metrics broadcast loop failed" in caplog.text
+
+
+def test_metrics_websocket_receives_broadcast_frames(monkeypatch):
+    """Registers the websocket with the shared broadcaster and batches queued frames into one array."""
+
+    async def fake_broadcast_loop():
+        while not backend_main._metrics_subscribers:
+            await asyncio.sleep(0.01)
+        backend_main._broadcast_metrics_frame(b'{"timestamp": 1}')
+        backend_main._broadcast_metrics_frame(b'{"timestamp": 2}')
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(backend_main, "_metrics_broadcast_loop", fake_broadcast_loop)
+    monkeypatch.setattr(backend_main, "_metrics_subscribers", set())
+
+    with TestClient(backend_main.app) as client:
+        with client.websocket_connect("/ws/metrics") as websocket:
+            assert websocket.receive_bytes() == b'[{"timestamp": 1},{"timestamp": 2}]'
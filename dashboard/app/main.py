@@ -1,13 +1,17 @@
 from pathlib import Path
+import asyncio
+import functools
+import gzip
+import hashlib
 import logging
-from time import perf_counter
+from time import monotonic, perf_counter
 from typing import Any
 
 import httpx
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from starlette.middleware.sessions import SessionMiddleware
 from websockets.client import connect as ws_connect
 
@@ -20,34 +24,100 @@ INDEX_FILE = STATIC_DIR / "index.html"
 LOGIN_FILE = STATIC_DIR / "login.html"
 
 
+def _load_page(path: Path) -> tuple[bytes, bytes, str]:
+    body = path.read_bytes()
+    return body, gzip.compress(body, compresslevel=9), hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+# Both pages are served on every tab load; read and gzip them once and let browsers revalidate with the ETag.
+INDEX_PAGE = _load_page(INDEX_FILE)
+LOGIN_PAGE = _load_page(LOGIN_FILE)
+
+
 class LoginPayload(BaseModel):
     username: str
     password: str
 
 
 class DashboardConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     max_points: int = Field(ge=30, le=1000)
     alerts_window_minutes: int = Field(ge=1, le=1440)
     perf_poll_seconds: int = Field(ge=2, le=300)
 
 
-runtime_config = DashboardConfig(
+# The config and its dump are swapped together as one tuple, so readers never see a half-applied update.
+_initial_config = DashboardConfig(
     max_points=settings.default_max_points,
     alerts_window_minutes=settings.default_alert_minutes,
     perf_poll_seconds=settings.default_perf_poll_seconds,
 )
+_runtime_config: tuple[DashboardConfig, dict] = (_initial_config, _initial_config.model_dump())
 
 logger = logging.getLogger(__name__)
 
+# Every open tab polls the same backend data, so proxied reads are shared for a short TTL.
+# Entries stay usable as a fallback for up to the stale limit while the backend is failing.
+_PROXY_CACHE_TTL_SECONDS = {
+    "/api/metrics/recent": 2.0,
+    "/api/alerts/recent": 5.0,
+}
+_PROXY_CACHE_MAX_STALE_SECONDS = 60.0
+_PROXY_CACHE_MAX_ENTRIES = 32
+_proxy_cache: dict[tuple, tuple[float, float, bytes]] = {}
+_proxy_inflight: dict[tuple, asyncio.Task] = {}
+# The performance card polls once per perf_poll_seconds per tab; one real probe serves them all for this long.
+_BACKEND_HEALTH_TTL_SECONDS = 2.0
+_backend_health: tuple[float, dict] | None = None
+_WS_PROXY_QUEUE_SIZE = 32
+# Bursts of backend frames are merged into one downstream frame: up to this many, or this long after the first.
+_WS_PROXY_BATCH_MAX_FRAMES = 16
+_WS_PROXY_BATCH_WINDOW_SECONDS = 0.01
+# Small read buffers on the backend socket so backpressure reaches the backend quickly. A backend frame
+# carries up to 50 samples of roughly 2 KiB each, which sets the floor for the size limit.
+_WS_BACKEND_MAX_FRAME_BYTES = 256 * 1024
+_WS_BACKEND_MAX_QUEUE = 16
+
+
 app = FastAPI(title="System Metrics Dashboard", version="0.1.0")
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.add_middleware(SessionMiddleware, secret_key=settings.session_secret)
 
 
-def _backend_ws_metrics_url() -> str:
-    if settings.backend_base_url.startswith("https://"):
-        return f"wss://{settings.backend_base_url[len('https://'):]}/ws/metrics"
-    return f"ws://{settings.backend_base_url[len('http://'):]}/ws/metrics"
+def _accepts_gzip(accept_encoding: str) -> bool:
+    # An explicit gzip entry wins over "*"; either only counts with a non-zero q-value.
+    wildcard = False
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding == "gzip":
+            return quality > 0
+        if coding == "*":
+            wildcard = quality > 0
+    return wildcard
+
+
+def _page_response(request: Request, page: tuple[bytes, bytes, str]) -> Response:
+    body, gzipped, digest = page
+    use_gzip = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    # Each encoding is a separate representation, so it gets its own ETag.
+    etag = f'"{digest}-gz"' if use_gzip else f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=gzipped, media_type="text/html", headers=headers)
+    return Response(content=body, media_type="text/html", headers=headers)
 
 
 def _require_auth(request: Request) -> None:
@@ -58,21 +128,81 @@ def _require_auth(request: Request) -> None:
         raise HTTPException(status_code=401, detail="Authentication required")
 
 
-async def _proxy_backend_get(path: str, params: dict[str, Any] | None = None) -> Any:
-    target = f"{settings.backend_base_url}{path}"
-    timeout = httpx.Timeout(5.0)
+def _backend_client() -> httpx.AsyncClient:
+    return app.state.backend_client
+
+
+def _cached_proxy_entry(key: tuple) -> tuple[float, float, bytes] | None:
+    entry = _proxy_cache.get(key)
+    if entry is not None and entry[1] <= monotonic():
+        del _proxy_cache[key]
+        return None
+    return entry
+
+
+def _store_proxy_entry(key: tuple, ttl_seconds: float, body: bytes) -> None:
+    now = monotonic()
+    _proxy_cache.pop(key, None)
+    _proxy_cache[key] = (now + ttl_seconds, now + _PROXY_CACHE_MAX_STALE_SECONDS, body)
+    while len(_proxy_cache) > _PROXY_CACHE_MAX_ENTRIES:
+        # Dicts keep insertion order, so the first key is the least recently stored.
+        del _proxy_cache[next(iter(_proxy_cache))]
+
+
+async def _fetch_backend_body(path: str, params: dict[str, Any] | None) -> bytes:
+    response = await _backend_client().get(path, params=params)
+    response.raise_for_status()
+    # Every proxied read is a JSON array, relayed untouched; a byte sniff replaces parsing it just to
+    # check the type, and runs here so a malformed body is never cached.
+    if not response.content.lstrip().startswith(b"["):
+        raise HTTPException(status_code=502, detail="Unexpected backend response format")
+    return response.content
+
+
+def _finish_inflight(key: tuple, task: asyncio.Task) -> None:
+    if _proxy_inflight.get(key) is task:
+        del _proxy_inflight[key]
+    if not task.cancelled():
+        # Mark the error as retrieved even if every waiter went away before it finished.
+        task.exception()
+
+
+async def _proxy_backend_get(path: str, params: dict[str, Any] | None = None) -> bytes:
+    ttl_seconds = _PROXY_CACHE_TTL_SECONDS.get(path)
+    key = (path, tuple(sorted(params.items())) if params else ())
+    cached = _cached_proxy_entry(key) if ttl_seconds is not None else None
+    if cached is not None and cached[0] > monotonic():
+        return cached[2]
+
+    # Concurrent identical requests share one upstream GET instead of each sending their own.
+    task = _proxy_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_backend_body(path, params))
+        _proxy_inflight[key] = task
+        task.add_done_callback(functools.partial(_finish_inflight, key))
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(target, params=params)
-            response.raise_for_status()
-    except httpx.HTTPStatusError as ex:
-        detail = ex.response.text if ex.response is not None else str(ex)
-        raise HTTPException(status_code=502, detail=f"Backend error: {detail}") from ex
-    except httpx.HTTPError as ex:
+        # Shielded so one caller disconnecting does not cancel the GET for the others.
+        body = await asyncio.shield(task)
+    except (httpx.HTTPError, HTTPException) as ex:
+        if cached is not None:
+            # Serve the last good payload while the backend is failing, up to the stale limit.
+            logger.warning("Serving stale %s after backend error: %s", path, str(ex))
+            return cached[2]
+        if isinstance(ex, HTTPException):
+            raise
+        if isinstance(ex, httpx.HTTPStatusError):
+            detail = ex.response.text if ex.response is not None else str(ex)
+            raise HTTPException(status_code=502, detail=f"Backend error: {detail}") from ex
         raise HTTPException(status_code=502, detail=f"Backend unavailable: {str(ex)}") from ex
 
-    return response.json()
+    if ttl_seconds is not None:
+        _store_proxy_entry(key, ttl_seconds, body)
+    return body
+
+
+def _json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/health")
@@ -83,6 +213,28 @@ def health_check() -> dict:
     }
 
 
+@app.on_event("startup")
+async def open_backend_client() -> None:
+    """Create the pooled backend HTTP client shared by every proxy request."""
+    app.state.backend_client = httpx.AsyncClient(
+        base_url=settings.backend_base_url,
+        timeout=httpx.Timeout(5.0),
+        # Negotiated via ALPN, so it only takes effect for https:// backends that offer h2;
+        # plain http:// and HTTP/1.1-only backends keep using HTTP/1.1.
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+
+
+@app.on_event("shutdown")
+async def close_backend_client() -> None:
+    await app.state.backend_client.aclose()
+
+
 @app.on_event("shutdown")
 def shutdown_cleanup() -> None:
     """Emit a deterministic shutdown event for graceful termination visibility."""
@@ -97,7 +249,7 @@ def login_page(request: Request):
     if request.session.get("authenticated") is True:
         return RedirectResponse(url="/", status_code=302)
 
-    return FileResponse(LOGIN_FILE)
+    return _page_response(request, LOGIN_PAGE)
 
 
 @app.post("/auth/login")
@@ -134,40 +286,33 @@ def auth_session(request: Request) -> dict:
 def index(request: Request):
     if settings.auth_enabled and request.session.get("authenticated") is not True:
         return RedirectResponse(url="/login", status_code=302)
-    return FileResponse(INDEX_FILE)
+    return _page_response(request, INDEX_PAGE)
 
 
 @app.get("/api/metrics/recent")
-async def proxy_recent_metrics(request: Request) -> list[dict]:
+async def proxy_recent_metrics(request: Request) -> Response:
     _require_auth(request)
-    data = await _proxy_backend_get("/api/metrics/recent")
-    if not isinstance(data, list):
-        raise HTTPException(status_code=502, detail="Unexpected backend response format")
-
-    return data
+    return _json_response(await _proxy_backend_get("/api/metrics/recent"))
 
 
 @app.get("/api/alerts/recent")
-async def proxy_recent_alerts(request: Request, minutes: int = 60) -> list[dict]:
+async def proxy_recent_alerts(request: Request, minutes: int = 60) -> Response:
     _require_auth(request)
-    data = await _proxy_backend_get("/api/alerts/recent", params={"minutes": minutes})
-    if not isinstance(data, list):
-        raise HTTPException(status_code=502, detail="Unexpected backend response format")
-    return data
+    return _json_response(await _proxy_backend_get("/api/alerts/recent", params={"minutes": minutes}))
 
 
 @app.get("/api/backend/performance")
 async def backend_performance(request: Request) -> dict:
+    global _backend_health
     _require_auth(request)
 
-    target = f"{settings.backend_base_url}/health"
-    timeout = httpx.Timeout(5.0)
+    if _backend_health is not None and _backend_health[0] > monotonic():
+        return _backend_health[1]
 
     started = perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(target)
-            response.raise_for_status()
+        response = await _backend_client().get("/health")
+        response.raise_for_status()
     except httpx.HTTPStatusError as ex:
         detail = ex.response.text if ex.response is not None else str(ex)
         raise HTTPException(status_code=502, detail=f"Backend error: {detail}") from ex
@@ -175,30 +320,93 @@ async def backend_performance(request: Request) -> dict:
         raise HTTPException(status_code=502, detail=f"Backend unavailable: {str(ex)}") from ex
 
     latency_ms = round((perf_counter() - started) * 1000.0, 2)
-    health = response.json() if isinstance(response.json(), dict) else {}
+    payload = response.json()
+    health = payload if isinstance(payload, dict) else {}
 
-    return {
+    result = {
         "latency_ms": latency_ms,
         "status": health.get("status", "unknown"),
         "redis": health.get("redis", "unknown"),
         "postgres": health.get("postgres", "unknown"),
     }
+    _backend_health = (monotonic() + _BACKEND_HEALTH_TTL_SECONDS, result)
+    return result
 
 
 @app.get("/api/dashboard/config")
 def get_dashboard_config(request: Request) -> dict:
     _require_auth(request)
-    return runtime_config.model_dump()
+    return _runtime_config[1]
 
 
 @app.put("/api/dashboard/config")
 def update_dashboard_config(payload: DashboardConfig, request: Request) -> dict:
+    global _runtime_config
     _require_auth(request)
 
-    runtime_config.max_points = payload.max_points
-    runtime_config.alerts_window_minutes = payload.alerts_window_minutes
-    runtime_config.perf_poll_seconds = payload.perf_poll_seconds
-    return runtime_config.model_dump()
+    _runtime_config = (payload, payload.model_dump())
+    return _runtime_config[1]
+
+
+async def _pump_backend_to_queue(backend_ws, queue: asyncio.Queue) -> None:
+    # The queue is bounded, so a slow browser stops backend reads instead of buffering without limit.
+    async for message in backend_ws:
+        await queue.put(message)
+
+
+def _merge_metric_frames(frames: list[bytes | str]) -> bytes:
+    # Backend frames are JSON arrays of samples; splice their contents into a single array.
+    parts = []
+    for frame in frames:
+        raw = (frame.encode("utf-8") if isinstance(frame, str) else bytes(frame)).strip()
+        if raw.startswith(b"[") and raw.endswith(b"]"):
+            raw = raw[1:-1].strip()
+        if raw:
+            parts.append(raw)
+    return b"[" + b",".join(parts) + b"]"
+
+
+async def _collect_frames(queue: asyncio.Queue) -> list[bytes | str]:
+    frames = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _WS_PROXY_BATCH_WINDOW_SECONDS
+    while len(frames) < _WS_PROXY_BATCH_MAX_FRAMES:
+        if not queue.empty():
+            frames.append(queue.get_nowait())
+            continue
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            frames.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return frames
+
+
+async def _pump_queue_to_client(queue: asyncio.Queue, websocket: WebSocket) -> None:
+    while True:
+        frames = await _collect_frames(queue)
+        if len(frames) > 1:
+            await websocket.send_bytes(_merge_metric_frames(frames))
+            continue
+        message = frames[0]
+        # Binary frames are relayed as-is; the browser decodes them, so no utf-8 roundtrip here.
+        if isinstance(message, (bytes, bytearray)):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+
+async def _pump_client_to_backend(websocket: WebSocket, backend_ws) -> None:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            await backend_ws.send(message["bytes"])
+        elif message.get("text") is not None:
+            await backend_ws.send(message["text"])
 
 
 @app.websocket("/ws/metrics")
@@ -208,12 +416,29 @@ async def proxy_live_metrics(websocket: WebSocket) -> None:
         return
 
     await websocket.accept()
-    target = _backend_ws_metrics_url()
+    target = settings.backend_ws_metrics_url
 
     try:
-        async with ws_connect(target) as backend_ws:
-            async for message in backend_ws:
-                await websocket.send_text(str(message))
+        # Metrics frames are small JSON; permessage-deflate costs more CPU and memory than it saves.
+        async with ws_connect(
+            target,
+            compression=None,
+            max_size=_WS_BACKEND_MAX_FRAME_BYTES,
+            max_queue=_WS_BACKEND_MAX_QUEUE,
+        ) as backend_ws:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=_WS_PROXY_QUEUE_SIZE)
+            tasks = {
+                asyncio.create_task(_pump_backend_to_queue(backend_ws, queue)),
+                asyncio.create_task(_pump_queue_to_client(queue, websocket)),
+                asyncio.create_task(_pump_client_to_backend(websocket, backend_ws)),
+            }
+            # Whichever side finishes first (either peer closing, or an error) ends the proxy.
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                task.result()
     except WebSocketDisconnect:
         return
     except Exception:
@@ -1,21 +1,52 @@
 import os
 
 
+_TRUTHY_VALUES = frozenset({"1", "true", "yes", "on"})
+
+
+def _env_int(name: str, default: str, floor: int) -> int:
+    return max(int(os.getenv(name, default)), floor)
+
+
+def _env_float(name: str, default: str, floor: float) -> float:
+    return max(float(os.getenv(name, default)), floor)
+
+
 class Settings:
+    __slots__ = (
+        "backend_base_url",
+        "backend_ws_metrics_url",
+        "auth_enabled",
+        "dashboard_username",
+        "dashboard_password",
+        "session_secret",
+        "default_max_points",
+        "default_alert_minutes",
+        "default_perf_poll_seconds",
+        "http_max_connections",
+        "http_max_keepalive",
+        "http_keepalive_expiry",
+    )
+
     def __init__(self) -> None:
         self.backend_base_url = os.getenv("BACKEND_BASE_URL", "http://localhost:8000").rstrip("/")
-        self.auth_enabled = os.getenv("DASHBOARD_AUTH_ENABLED", "true").lower() in {
-            "1",
-            "true",
-            "yes",
-            "on",
-        }
+        ws_scheme = "wss" if self.backend_base_url.startswith("https://") else "ws"
+        # Upstream of the /ws/metrics proxy. The dashboard's own WebSocket side (websockets
+        # implementation, deflate off, frame size and queue limits) is set by the uvicorn flags
+        # in dashboard/Dockerfile, which also select the uvloop loop and httptools parser.
+        self.backend_ws_metrics_url = f"{ws_scheme}://{self.backend_base_url.split('://', 1)[-1]}/ws/metrics"
+        self.auth_enabled = os.getenv("DASHBOARD_AUTH_ENABLED", "true").lower() in _TRUTHY_VALUES
         self.dashboard_username = os.getenv("DASHBOARD_USERNAME", "admin")
         self.dashboard_password = os.getenv("DASHBOARD_PASSWORD", "admin")
         self.session_secret = os.getenv("DASHBOARD_SESSION_SECRET", "dev-dashboard-secret")
-        self.default_max_points = max(int(os.getenv("DASHBOARD_MAX_POINTS", "150")), 30)
-        self.default_alert_minutes = max(int(os.getenv("DASHBOARD_ALERT_MINUTES", "60")), 1)
-        self.default_perf_poll_seconds = max(int(os.getenv("DASHBOARD_PERF_POLL_SECONDS", "5")), 2)
+        self.default_max_points = _env_int("DASHBOARD_MAX_POINTS", "150", 30)
+        self.default_alert_minutes = _env_int("DASHBOARD_ALERT_MINUTES", "60", 1)
+        self.default_perf_poll_seconds = _env_int("DASHBOARD_PERF_POLL_SECONDS", "5", 2)
+        # Limits for the httpx client to the backend. Inbound HTTP is served by uvicorn with
+        # --loop uvloop --http httptools, as set in dashboard/Dockerfile.
+        self.http_max_connections = _env_int("DASHBOARD_HTTP_MAX_CONNECTIONS", "100", 1)
+        self.http_max_keepalive = _env_int("DASHBOARD_HTTP_MAX_KEEPALIVE", "40", 0)
+        self.http_keepalive_expiry = _env_float("DASHBOARD_HTTP_KEEPALIVE_EXPIRY", "30", 0.0)
 
 
 settings = Settings()
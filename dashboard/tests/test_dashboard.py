@@ -0,0 +1,231 @@
+"""Unit tests for the dashboard proxy with the backend mocked out.
+
+These tests exercise the proxy cache, live-stream batching, and page serving without a
+running backend.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from dashboard.app import main as dashboard_main
+
+
+class FakeBackend:
+    """httpx transport handler that records requests and replies with queued responses.
+
+    Each reply is a status code and body; the last reply is repeated once the queue runs out.
+    Requests wait on ``release`` (when set) so tests can hold several of them in flight.
+    """
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.release = None
+
+    async def __call__(self, request):
+        self.requests.append(str(request.url))
+        if self.release is not None:
+            await self.release.wait()
+        status_code, body = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        return httpx.Response(status_code, content=body)
+
+
+@pytest.fixture(autouse=True)
+def reset_proxy_state(monkeypatch):
+    """Give every test empty proxy caches and the dashboard with auth turned off."""
+
+    monkeypatch.setattr(dashboard_main, "_proxy_cache", {})
+    monkeypatch.setattr(dashboard_main, "_proxy_inflight", {})
+    monkeypatch.setattr(dashboard_main, "_backend_health", None)
+    monkeypatch.setattr(dashboard_main.settings, "auth_enabled", False)
+
+
+def use_backend(backend):
+    """Point the shared backend client at a fake backend handler."""
+
+    dashboard_main.app.state.backend_client = httpx.AsyncClient(
+        base_url="http://backend",
+        transport=httpx.MockTransport(backend),
+    )
+
+
+def test_concurrent_identical_gets_share_one_upstream_request():
+    """Sends a single backend GET for many concurrent identical proxy reads."""
+
+    backend = FakeBackend((200, b'[{"timestamp": 1}]'))
+    use_backend(backend)
+
+    async def _read_concurrently():
+        backend.release = asyncio.Event()
+        readers = [
+            asyncio.create_task(dashboard_main._proxy_backend_get("/api/metrics/recent"))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        backend.release.set()
+        return await asyncio.gather(*readers)
+
+    bodies = asyncio.run(_read_concurrently())
+
+    assert bodies == [b'[{"timestamp": 1}]'] * 5
+    assert backend.requests == ["http://backend/api/metrics/recent"]
+    assert dashboard_main._proxy_inflight == {}
+
+
+def test_recent_metrics_served_from_cache_within_ttl():
+    """Answers repeat reads from the cache and relays the backend bytes untouched."""
+
+    backend = FakeBackend((200, b'[{"timestamp": 1}]'))
+    use_backend(backend)
+
+    client = TestClient(dashboard_main.app)
+    first = client.get("/api/metrics/recent")
+    second = client.get("/api/metrics/recent")
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers["content-type"] == "application/json"
+    assert second.content == b'[{"timestamp": 1}]'
+    assert len(backend.requests) == 1
+
+
+def test_stale_body_served_after_backend_error(monkeypatch):
+    """Falls back to the last good body when the backend fails after the TTL expired."""
+
+    monkeypatch.setattr(dashboard_main, "_PROXY_CACHE_TTL_SECONDS", {"/api/metrics/recent": 0.0})
+    backend = FakeBackend((200, b'[{"timestamp": 1}]'), (503, b"redis down"))
+    use_backend(backend)
+
+    client = TestClient(dashboard_main.app)
+    fresh = client.get("/api/metrics/recent")
+    stale = client.get("/api/metrics/recent")
+
+    assert fresh.status_code == stale.status_code == 200
+    assert stale.content == b'[{"timestamp": 1}]'
+    assert len(backend.requests) == 2
+
+
+def test_backend_error_without_cached_body_returns_502():
+    """Returns 502 with the backend's error when there is nothing to fall back to."""
+
+    use_backend(FakeBackend((500, b"boom")))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(dashboard_main._proxy_backend_get("/api/metrics/recent"))
+
+    assert error.value.status_code == 502
+    assert "boom" in error.value.detail
+
+
+def test_non_array_backend_body_returns_502():
+    """Rejects backend bodies that are not JSON arrays without caching them."""
+
+    use_backend(FakeBackend((200, b'{"detail": "unexpected"}')))
+
+    client = TestClient(dashboard_main.app)
+    response = client.get("/api/alerts/recent", params={"minutes": 5})
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == "Unexpected backend response format"
+    assert dashboard_main._proxy_cache == {}
+
+
+def test_non_array_backend_body_keeps_last_good_body(monkeypatch):
+    """Serves the earlier good body, and keeps it cached, when the backend returns a non-array."""
+
+    monkeypatch.setattr(dashboard_main, "_PROXY_CACHE_TTL_SECONDS", {"/api/metrics/recent": 0.0})
+    backend = FakeBackend((200, b'[{"timestamp": 1}]'), (200, b'{"detail": "unexpected"}'))
+    use_backend(backend)
+
+    client = TestClient(dashboard_main.app)
+    fresh = client.get("/api/metrics/recent")
+    stale = client.get("/api/metrics/recent")
+    again = client.get("/api/metrics/recent")
+
+    assert fresh.status_code == stale.status_code == again.status_code == 200
+    assert stale.content == again.content == b'[{"timestamp": 1}]'
+    assert [entry[2] for entry in dashboard_main._proxy_cache.values()] == [b'[{"timestamp": 1}]']
+    assert len(backend.requests) == 3
+
+
+def test_merge_metric_frames_splices_arrays():
+    """Joins the contents of array frames, bare objects, and text frames into one array."""
+
+    frames = [b'[{"timestamp": 1}]', '[{"timestamp": 2}, {"timestamp": 3}]', b"[]", b' {"timestamp": 4} ']
+
+    assert dashboard_main._merge_metric_frames(frames) == (
+        b'[{"timestamp": 1},{"timestamp": 2}, {"timestamp": 3},{"timestamp": 4}]'
+    )
+
+
+def test_collect_frames_stops_at_batch_size(monkeypatch):
+    """Takes at most one batch of queued frames and leaves the rest for the next send."""
+
+    monkeypatch.setattr(dashboard_main, "_WS_PROXY_BATCH_MAX_FRAMES", 3)
+
+    async def _collect():
+        queue = asyncio.Queue()
+        for index in range(5):
+            queue.put_nowait(f"[{index}]".encode())
+        return await dashboard_main._collect_frames(queue), queue.qsize()
+
+    frames, remaining = asyncio.run(_collect())
+
+    assert frames == [b"[0]", b"[1]", b"[2]"]
+    assert remaining == 2
+
+
+def test_index_returns_304_for_matching_etag():
+    """Revalidates the in-memory index page with its ETag."""
+
+    client = TestClient(dashboard_main.app)
+    first = client.get("/", headers={"Accept-Encoding": "identity"})
+    revalidated = client.get(
+        "/",
+        headers={"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]},
+    )
+
+    assert first.status_code == 200
+    assert first.content == dashboard_main.INDEX_FILE.read_bytes()
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == first.headers["etag"]
+
+
+def test_index_serves_gzip_variant_with_its_own_etag():
+    """Serves the precompressed page to gzip clients under a distinct ETag."""
+
+    client = TestClient(dashboard_main.app)
+    plain = client.get("/", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.content == plain.content
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expect_gzip"),
+    [
+        ("gzip", True),
+        ("br, gzip;q=0.5", True),
+        ("deflate, *", True),
+        ("gzip;q=0", False),
+        ("GZIP; Q=0.0, deflate", False),
+        ("*, gzip;q=0", False),
+        ("*;q=0", False),
+        ("identity", False),
+    ],
+)
+def test_index_honors_accept_encoding_q_values(accept_encoding, expect_gzip):
+    """Sends gzip only to clients whose Accept-Encoding gives it a non-zero q-value."""
+
+    client = TestClient(dashboard_main.app)
+    response = client.get("/", headers={"Accept-Encoding": accept_encoding})
+
+    assert response.status_code == 200
+    assert (response.headers.get("content-encoding") == "gzip") is expect_gzip
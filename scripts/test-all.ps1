@@ -4,7 +4,7 @@ Run all project tests (C++ and Python).
 
 .DESCRIPTION
 Builds and runs C++ unit tests in `agent/` using CMake + CTest, then runs
-Python backend tests in `backend/` using pytest. C++ tests are executed in a
+Python backend and dashboard tests using pytest. C++ tests are executed in a
 reusable Docker test image to avoid local toolchain dependency issues.
 
 .USAGE
@@ -17,6 +17,7 @@ $repoRoot = Resolve-Path (Join-Path $PSScriptRoot '..')
 $agentSourceDir = Join-Path $repoRoot 'agent'
 $agentBuildDir = Join-Path $agentSourceDir 'build'
 $backendDir = Join-Path $repoRoot 'backend'
+$dashboardDir = Join-Path $repoRoot 'dashboard'
 $backendVenvPython = Join-Path $backendDir '.venv\Scripts\python.exe'
 $agentSourceDirDocker = ($agentSourceDir -replace '\\', '/')
 $cppTestImage = 'metrics-agent-test-runner:latest'
@@ -74,6 +75,12 @@ try {
     Invoke-CheckedCommand -Command $backendVenvPython -Arguments @('-m', 'pip', 'install', '-r', (Join-Path $backendDir 'requirements.txt')) -ErrorMessage 'Installing backend test dependencies failed'
     Invoke-CheckedCommand -Command $backendVenvPython -Arguments @('-m', 'pytest', (Join-Path $backendDir 'tests'), '-q') -ErrorMessage 'Backend Python tests failed'
 
+    Write-Host ''
+    Write-Host '=== Running Python tests (dashboard) ==='
+
+    Invoke-CheckedCommand -Command $backendVenvPython -Arguments @('-m', 'pip', 'install', '-r', (Join-Path $dashboardDir 'requirements.txt')) -ErrorMessage 'Installing dashboard test dependencies failed'
+    Invoke-CheckedCommand -Command $backendVenvPython -Arguments @('-m', 'pytest', (Join-Path $dashboardDir 'tests'), '-q') -ErrorMessage 'Dashboard Python tests failed'
+
     Write-Host ''
     Write-Host 'All tests passed.' -ForegroundColor Green
 }